@@ -1,14 +1,16 @@
 from google import genai
+from collections import deque
 import json
+import time
 
 class AI:
     PROMPT = """You are an assistant that provides weather-based home comfort and energy-saving suggestions. Given the following data in json format:
-    House orientation: The direction the house is facing.
-    is_hotspot: Whether the location is a heat hotspot based on the heat score and threshold.
-    Heat threshold: The heat score value above which the weather is considered hot.
-    Weighted heat score: A weighted value based on normalised air temperature, humidity, and wind speed from the 3 nearest weather stations.
-    Heat score percentile: The percentile ranking of the current heat score compared to past data.
-    Weather station measurements: Weather data from the 3 nearest stations.
+    orientation: The direction the house is facing.
+    hotspot: Whether the location is a heat hotspot based on the heat score and threshold.
+    threshold: The heat score value above which the weather is considered hot.
+    score: A weighted value based on normalised air temperature, humidity, and wind speed from the nearest weather stations.
+    percentile: The percentile ranking of the current heat score compared to past data.
+    stations: Weather data from the nearest stations, as rows of [{station_fields}].
 
     Data:
     {data}
@@ -30,18 +32,110 @@ class AI:
     Suggestions: Even though it's not a hotspot, consider opening windows on the south and east sides of your house to take advantage of the breezes. Drawing bedroom curtains during the day may help you feel cool while conserving energy.
     """
 
+    # Station columns the prompt actually refers to, in the order they are emitted
+    STATION_FIELDS = ["location", "airTemp", "humidity", "windSpeed", "windDirection_dir", "uv_index"]
+    MODEL = "gemini-2.0-flash"
+    TOKEN_BUDGET = 1024
+    CHARS_PER_TOKEN = 4
+
     def __init__(self, config: dict):
-        self.CLIENT = genai.Client(api_key=config["GEMINI_KEY"])
+        http_options = {"base_url": config["GEMINI_URL"]} if config.get("GEMINI_URL") else None
+        self.CLIENT = genai.Client(api_key=config["GEMINI_KEY"], http_options=http_options)
         self.CONFIG = config
+        self.TOKEN_BUDGET = int(config.get("PROMPT_TOKEN_BUDGET") or self.TOKEN_BUDGET)
+        fixed_tokens = self._estimate_tokens(self.PROMPT.format(data="", station_fields=", ".join(self.STATION_FIELDS)))
+        if self.TOKEN_BUDGET <= fixed_tokens:
+            raise ValueError(f"PROMPT_TOKEN_BUDGET {self.TOKEN_BUDGET} does not fit the {fixed_tokens} token instructions")
+        self.USAGE = deque(maxlen=1000)
+
+    def _estimate_tokens(self, text: str) -> int:
+        """
+        Roughly estimates the number of tokens in a piece of text without calling the API.
+        Parameters:
+            text (str): The text to estimate.
+        Returns:
+            int: The estimated token count.
+        """
+        return -(-len(text) // self.CHARS_PER_TOKEN)
+
+    def _compact_data(self, data_dict: dict, num_stations: int = None) -> dict:
+        """
+        Keeps only the fields referenced by the prompt, rounded and with short keys.
+        Parameters:
+            data_dict (dict): Hotspot data as returned by the analysis endpoint.
+            num_stations (int, optional): Maximum number of stations to include.
+        Returns:
+            dict: The compact data.
+        """
+        stations = data_dict.get("weather_station_data", [])
+        stations = sorted(stations, key=lambda s: s.get("distance", 0))[:num_stations]
+        rows = []
+        for station in stations:
+            row = []
+            for field in self.STATION_FIELDS:
+                value = station.get(field)
+                row.append(round(value, 1) if isinstance(value, float) else value)
+            rows.append(row)
+
+        return {
+            "orientation": data_dict.get("house_orientation"),
+            "hotspot": data_dict.get("isHotspot"),
+            "score": round(data_dict.get("weighted_score", 0), 3),
+            "threshold": round(data_dict.get("heat_threshold", 0), 3),
+            "percentile": round(data_dict.get("percentile", 0), 1),
+            "stations": rows,
+        }
+
+    def build_prompt(self, data_dict: dict) -> str:
+        """
+        Builds the prompt from the compact data, dropping the furthest stations until it fits the token budget.
+        If even a single station does not fit, the over-budget prompt is returned and the overrun is logged.
+        Parameters:
+            data_dict (dict): Hotspot data as returned by the analysis endpoint.
+        Returns:
+            str: The prompt to send to the model.
+        """
+        num_stations = len(data_dict.get("weather_station_data", []))
+        while True:
+            data = json.dumps(self._compact_data(data_dict, num_stations), separators=(",", ":"))
+            prompt = self.PROMPT.format(data=data, station_fields=", ".join(self.STATION_FIELDS))
+            if self._estimate_tokens(prompt) <= self.TOKEN_BUDGET:
+                return prompt
+            if num_stations <= 1:
+                print(f"AI prompt of {self._estimate_tokens(prompt)} tokens is over the budget of {self.TOKEN_BUDGET}")
+                return prompt
+            num_stations -= 1
 
     def generate_suggestions(self, data_dict: dict) -> str:
-        # print(data_dict)
-        prompt = self.PROMPT.format(data=json.dumps(data_dict, indent=4))
+        prompt = self.build_prompt(data_dict)
+        start = time.perf_counter()
         response = self.CLIENT.models.generate_content(
-            model="gemini-2.0-flash",
+            model=self.MODEL,
             contents=prompt,
         )
+        self._record_usage(prompt, response, time.perf_counter() - start)
 
         return response.text
 
+    async def generate_suggestions_async(self, data_dict: dict) -> str:
+        prompt = self.build_prompt(data_dict)
+        start = time.perf_counter()
+        response = await self.CLIENT.aio.models.generate_content(
+            model=self.MODEL,
+            contents=prompt,
+        )
+        self._record_usage(prompt, response, time.perf_counter() - start)
 
+        return response.text
+
+    def _record_usage(self, prompt: str, response, latency: float):
+        usage = getattr(response, "usage_metadata", None)
+        self.USAGE.append(
+            {
+                "prompt_tokens": getattr(usage, "prompt_token_count", None) or self._estimate_tokens(prompt),
+                "response_tokens": getattr(usage, "candidates_token_count", None) or self._estimate_tokens(response.text or ""),
+                "latency_s": round(latency, 3),
+                "over_budget": self._estimate_tokens(prompt) > self.TOKEN_BUDGET,
+            }
+        )
+        print(f"AI suggestion usage: {self.USAGE[-1]}")
@@ -0,0 +1,362 @@
+import json
+import logging
+import os
+import queue
+import threading
+from datetime import datetime
+from functools import partial
+
+import numpy as np
+import pandas as pd
+import requests
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+def haversine_km(latitudes, longitudes, station_latitudes, station_longitudes) -> np.ndarray:
+    """
+    Great-circle distances between every location and every station.
+    Parameters:
+        latitudes, longitudes (array-like): Locations, shape (n,).
+        station_latitudes, station_longitudes (array-like): Stations, shape (s,).
+    Returns:
+        np.ndarray: Distances in km, shape (n, s).
+    """
+    lat1 = np.radians(np.asarray(latitudes, dtype=float))[:, None]
+    lon1 = np.radians(np.asarray(longitudes, dtype=float))[:, None]
+    lat2 = np.radians(np.asarray(station_latitudes, dtype=float))[None, :]
+    lon2 = np.radians(np.asarray(station_longitudes, dtype=float))[None, :]
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+
+class LogSink:
+    """Writes alert events to the log."""
+
+    def send(self, events: list[dict]):
+        for event in events:
+            logging.getLogger("heat_alerts").warning("Heat alert: %s", event)
+
+
+class QueueSink:
+    """Puts alert events on a queue for another worker to consume."""
+
+    def __init__(self, events_queue: queue.Queue = None):
+        self.QUEUE = events_queue or queue.Queue()
+
+    def send(self, events: list[dict]):
+        for event in events:
+            self.QUEUE.put(event)
+
+
+class WebhookSink:
+    """POSTs alert events as json batches to a webhook url."""
+
+    def __init__(self, url: str, batch_size: int = 1000, timeout: float = 10):
+        self.URL = url
+        self.BATCH_SIZE = batch_size
+        self.TIMEOUT = timeout
+
+    def send(self, events: list[dict]):
+        for i in range(0, len(events), self.BATCH_SIZE):
+            try:
+                requests.post(self.URL, json={"events": events[i:i + self.BATCH_SIZE]}, timeout=self.TIMEOUT).raise_for_status()
+            except requests.exceptions.RequestException as e:
+                print(f"Error sending {len(events[i:i + self.BATCH_SIZE])} heat alerts to {self.URL}: {e}")
+
+
+def create_sink(config: dict):
+    """Creates the sink named by ALERT_SINK ("log", "queue" or "webhook" with ALERT_WEBHOOK_URL)."""
+    kind = config.get("ALERT_SINK") or "log"
+    if kind == "log":
+        return LogSink()
+    if kind == "queue":
+        return QueueSink()
+    if kind == "webhook":
+        if not config.get("ALERT_WEBHOOK_URL"):
+            raise ValueError("ALERT_SINK=webhook requires ALERT_WEBHOOK_URL")
+        return WebhookSink(config["ALERT_WEBHOOK_URL"])
+    raise ValueError(f"Unknown alert sink {kind}")
+
+
+class AlertDispatcher:
+    """Sends alert events to a sink from a background thread, so evaluating a snapshot never waits on the sink."""
+
+    def __init__(self, sink):
+        self.SINK = sink
+        self.QUEUE = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="heat-alerts", daemon=True)
+        self._thread.start()
+
+    def put(self, build_events):
+        """Queues a callable returning the events to send; it is called on the dispatcher thread."""
+        self.QUEUE.put(build_events)
+
+    def join(self):
+        """Blocks until every queued batch has been sent."""
+        self.QUEUE.join()
+
+    def _run(self):
+        while True:
+            build_events = self.QUEUE.get()
+            try:
+                events = build_events()
+                if events:
+                    self.SINK.send(events)
+            except Exception as e:
+                print(f"Error dispatching heat alerts: {e}")
+            finally:
+                self.QUEUE.task_done()
+
+
+class HeatAlerts:
+    """HeatAlerts keeps postal code subscriptions and evaluates all of them against each new weather snapshot.
+    On subscription the nearest stations, their inverse distance weights and the historical heat threshold
+    (the same 90th percentile is_hotspot uses) are precomputed, so evaluating a snapshot is a single
+    vectorized pass over all subscriptions. Events are only sent when a subscription's hotspot state changes,
+    and are built and sent on a background thread so a slow sink never holds up the weather refresh.
+    Attributes:
+        SINK: Object with a send(events) method that receives the alert events.
+        dispatcher (AlertDispatcher): Background thread that builds and sends the events.
+        PATH (str): CSV file the subscriptions are stored in, or None to keep them in memory only.
+        NUM_STATIONS (int): Number of nearest stations per subscription.
+        PERCENTILE_THRESHOLD (int): Historical percentile above which a location is a hotspot.
+        SUBSCRIPTIONS (pd.DataFrame): The subscriptions and their precomputed stations, weights and thresholds.
+    Methods:
+        subscribe(postal_code, target): Registers a postal code.
+        subscribe_many(latitudes, longitudes, postal_codes, targets): Registers many locations at once.
+        unsubscribe(subscription_id): Removes a subscription.
+        evaluate(timestamp, snapshot): Evaluates every subscription against a snapshot and queues transitions.
+    """
+
+    CHUNK_SIZE = 2000
+
+    def __init__(self, weather_service, sink=None, path: str = None, num_stations: int = 3, percentile_threshold: int = 90):
+        self.weather_service = weather_service
+        self.SINK = sink or LogSink()
+        self.dispatcher = AlertDispatcher(self.SINK)
+        self.PATH = path
+        self.NUM_STATIONS = num_stations
+        self.PERCENTILE_THRESHOLD = percentile_threshold
+        self.lock = threading.Lock()
+        self._history = None
+        self.SUBSCRIPTIONS = self._load()
+        self._arrays = self._encode(self.SUBSCRIPTIONS)
+        # Hotspot state per subscription, aligned with SUBSCRIPTIONS; stored subscriptions start from the current snapshot
+        self._state = np.zeros(len(self.SUBSCRIPTIONS), dtype=bool)
+        if len(self.SUBSCRIPTIONS):
+            scores = self._scores(weather_service.get_current_weather(), self._arrays)
+            self._state = scores > self._arrays["threshold"]
+
+    def _columns(self) -> list[str]:
+        stations = [f"station_{k}" for k in range(self.NUM_STATIONS)]
+        weights = [f"weight_{k}" for k in range(self.NUM_STATIONS)]
+        return ["id", "postal_code", "target", "latitude", "longitude"] + stations + weights + ["threshold"]
+
+    def _load(self) -> pd.DataFrame:
+        if self.PATH and os.path.exists(self.PATH):
+            return pd.read_csv(self.PATH, dtype={"postal_code": str, "target": str})
+        return pd.DataFrame(columns=self._columns())
+
+    def _save(self, new_rows: pd.DataFrame = None):
+        if not self.PATH:
+            return
+        if new_rows is not None and os.path.exists(self.PATH):
+            new_rows.to_csv(self.PATH, mode="a", header=False, index=False)
+        else:
+            self.SUBSCRIPTIONS.to_csv(self.PATH, index=False)
+
+    def _historical_matrices(self) -> tuple[dict, np.ndarray, np.ndarray]:
+        """
+        Sums and counts historical heat_score_norm per (date, station), so the weighted score of every
+        date for any set of stations and weights is two matrix products.
+        Returns:
+            tuple: stationId to column, sums of shape (dates, stations), counts of shape (dates, stations).
+        """
+        if self._history is None:
+            grouped = self.weather_service.DATA.groupby(["date", "stationId"])["heat_score_norm"].agg(["sum", "count"])
+            sums = grouped["sum"].unstack(fill_value=0)
+            counts = grouped["count"].unstack(fill_value=0)
+            columns = {station_id: i for i, station_id in enumerate(sums.columns)}
+            self._history = columns, sums.to_numpy(dtype=float), counts.to_numpy(dtype=float)
+        return self._history
+
+    def _thresholds(self, station_ids: np.ndarray, weights: np.ndarray) -> np.ndarray:
+        """
+        Historical heat thresholds for many station sets at once, matching is_hotspot: per date, the weights
+        are normalised over that date's readings of the stations, and the threshold is a percentile over dates.
+        Parameters:
+            station_ids (np.ndarray): Station ids, shape (n, NUM_STATIONS).
+            weights (np.ndarray): Inverse distance weights, shape (n, NUM_STATIONS).
+        Returns:
+            np.ndarray: Thresholds, shape (n,).
+        """
+        columns, sums, counts = self._historical_matrices()
+        index = np.vectorize(lambda s: columns.get(s, -1))(station_ids)
+        # Stations without history contribute nothing
+        weights = np.where(index >= 0, weights, 0)
+        index = np.maximum(index, 0)
+        thresholds = np.empty(len(station_ids))
+        for start in range(0, len(station_ids), self.CHUNK_SIZE):
+            end = start + self.CHUNK_SIZE
+            # (dates, n, NUM_STATIONS) weighted by (n, NUM_STATIONS)
+            numerator = (sums[:, index[start:end]] * weights[start:end]).sum(axis=2)
+            denominator = (counts[:, index[start:end]] * weights[start:end]).sum(axis=2)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                scores = numerator / denominator
+            thresholds[start:end] = np.nanpercentile(scores, self.PERCENTILE_THRESHOLD, axis=0)
+        return thresholds
+
+    def _encode(self, subscriptions: pd.DataFrame) -> dict:
+        """
+        Converts subscriptions to the arrays evaluated per snapshot: station codes into a small table of
+        station ids, weights and thresholds, plus the fields sent with events with missing values as None.
+        """
+        station_ids = subscriptions[[f"station_{k}" for k in range(self.NUM_STATIONS)]].to_numpy()
+        codes, stations = pd.factorize(station_ids.ravel())
+        fields = subscriptions.reindex(columns=["id", "postal_code", "target"]).astype(object)
+        return {
+            "codes": codes.reshape(station_ids.shape),
+            "stations": stations,
+            "weights": subscriptions[[f"weight_{k}" for k in range(self.NUM_STATIONS)]].to_numpy(dtype=float),
+            "threshold": subscriptions["threshold"].to_numpy(dtype=float),
+            "fields": fields.where(fields.notna(), None).to_numpy(),
+        }
+
+    def _scores(self, snapshot: pd.DataFrame, arrays: dict) -> np.ndarray:
+        """Weighted heat scores of encoded subscriptions in a snapshot, renormalising over stations missing from it."""
+        heat = snapshot.set_index("stationId")["heat_score_norm"]
+        values = heat.reindex(arrays["stations"]).to_numpy(dtype=float)[arrays["codes"]]
+        weights = np.where(np.isnan(values), 0, arrays["weights"])
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.nansum(values * weights, axis=1) / weights.sum(axis=1)
+
+    def subscribe(self, postal_code: str, target: str = None) -> dict:
+        """
+        Registers a postal code, looking up its coordinates once.
+        Parameters:
+            postal_code (str): The postal code to watch.
+            target (str, optional): Where the user wants to be notified, passed through to the sink.
+        Returns:
+            dict: The subscription, including its current hotspot state.
+        """
+        location = self.weather_service.postal_code_to_latlong(postal_code)
+        if location is None:
+            raise ValueError(f"Postal code {postal_code} not found")
+        subscription_id = self.subscribe_many([location[0]], [location[1]], [str(postal_code)], [target])[0]
+        with self.lock:
+            i = np.flatnonzero(self.SUBSCRIPTIONS["id"].to_numpy() == subscription_id)[0]
+            subscription = json.loads(self.SUBSCRIPTIONS.iloc[[i]].to_json(orient="records"))[0]
+            subscription["isHotspot"] = bool(self._state[i])
+        return subscription
+
+    def subscribe_many(self, latitudes, longitudes, postal_codes=None, targets=None) -> list[int]:
+        """
+        Registers many locations at once. Their initial hotspot state is taken from the current snapshot
+        without notifying, so only later transitions are dispatched.
+        Parameters:
+            latitudes, longitudes (array-like): Coordinates of the locations.
+            postal_codes (list, optional): Postal codes of the locations.
+            targets (list, optional): Notification targets, passed through to the sink.
+        Returns:
+            list[int]: The new subscription ids.
+        """
+        latitudes = np.asarray(latitudes, dtype=float)
+        longitudes = np.asarray(longitudes, dtype=float)
+        n = len(latitudes)
+        snapshot = self.weather_service.get_current_weather()
+
+        distances = haversine_km(latitudes, longitudes, snapshot["latitude"], snapshot["longitude"])
+        nearest = np.argsort(distances, axis=1)[:, : self.NUM_STATIONS]
+        nearest_distances = np.take_along_axis(distances, nearest, axis=1)
+        # Same inverse distance weights as find_nearest_stations, guarding against a zero distance
+        weights = 1 / np.maximum(nearest_distances, 1e-6)
+        weights /= weights.sum(axis=1, keepdims=True)
+        station_ids = snapshot["stationId"].to_numpy()[nearest]
+
+        rows = pd.DataFrame(
+            {
+                "postal_code": postal_codes if postal_codes is not None else [None] * n,
+                "target": targets if targets is not None else [None] * n,
+                "latitude": latitudes,
+                "longitude": longitudes,
+            }
+        )
+        for k in range(self.NUM_STATIONS):
+            rows[f"station_{k}"] = station_ids[:, k]
+        for k in range(self.NUM_STATIONS):
+            rows[f"weight_{k}"] = weights[:, k]
+        rows["threshold"] = self._thresholds(station_ids, weights)
+        state = self._scores(snapshot, self._encode(rows)) > rows["threshold"].to_numpy()
+
+        with self.lock:
+            next_id = int(self.SUBSCRIPTIONS["id"].max()) + 1 if len(self.SUBSCRIPTIONS) else 1
+            rows.insert(0, "id", np.arange(next_id, next_id + n))
+            rows = rows[self._columns()]
+            self.SUBSCRIPTIONS = rows if not len(self.SUBSCRIPTIONS) else pd.concat([self.SUBSCRIPTIONS, rows], ignore_index=True)
+            self._state = np.concatenate([self._state, state])
+            self._arrays = self._encode(self.SUBSCRIPTIONS)
+            self._save(rows)
+        return rows["id"].tolist()
+
+    def unsubscribe(self, subscription_id: int):
+        """Removes a subscription."""
+        with self.lock:
+            keep = self.SUBSCRIPTIONS["id"].to_numpy() != subscription_id
+            if keep.all():
+                raise ValueError(f"Unknown subscription {subscription_id}")
+            self.SUBSCRIPTIONS = self.SUBSCRIPTIONS[keep].reset_index(drop=True)
+            self._state = self._state[keep]
+            self._arrays = self._encode(self.SUBSCRIPTIONS)
+            self._save()
+
+    def evaluate(self, timestamp: datetime, snapshot: pd.DataFrame) -> int:
+        """
+        Evaluates every subscription against a snapshot in one pass and queues events for those whose
+        hotspot state changed. Registered as a WeatherAnalyzer snapshot listener.
+        Parameters:
+            timestamp (datetime): Time of the snapshot.
+            snapshot (pd.DataFrame): Processed current weather data.
+        Returns:
+            int: The number of transitions queued for the sink.
+        """
+        with self.lock:
+            if not len(self.SUBSCRIPTIONS):
+                return 0
+            arrays = self._arrays
+            scores = self._scores(snapshot, arrays)
+            thresholds = arrays["threshold"]
+            # Keep the previous state where no station reported
+            state = np.where(np.isnan(scores), self._state, scores > thresholds)
+            changed = np.flatnonzero(state != self._state)
+            self._state = state
+
+        if len(changed):
+            self.dispatcher.put(
+                partial(
+                    self._events,
+                    timestamp.isoformat(),
+                    arrays["fields"][changed],
+                    state[changed],
+                    scores[changed],
+                    thresholds[changed],
+                )
+            )
+        return len(changed)
+
+    @staticmethod
+    def _events(timestamp: str, fields: np.ndarray, state: np.ndarray, scores: np.ndarray, thresholds: np.ndarray) -> list[dict]:
+        return [
+            {
+                "id": int(subscription_id),
+                "postal_code": postal_code,
+                "target": target,
+                "isHotspot": is_hotspot,
+                "weighted_score": score,
+                "heat_threshold": threshold,
+                "timestamp": timestamp,
+            }
+            for (subscription_id, postal_code, target), is_hotspot, score, threshold in zip(
+                fields.tolist(), state.tolist(), scores.tolist(), thresholds.tolist()
+            )
+        ]
@@ -1,17 +1,28 @@
-import requests
 import pandas as pd
 
-API = {
-    "air_temp": "https://api-open.data.gov.sg/v2/real-time/api/air-temperature",
-    "wind_speed": "https://api-open.data.gov.sg/v2/real-time/api/wind-speed",
-    "wind_direction": "https://api-open.data.gov.sg/v2/real-time/api/wind-direction",  # readings are in degrees, ie 315 degree --> Northwest
-    "relative_humidity": "https://api-open.data.gov.sg/v2/real-time/api/relative-humidity",
-    "2_hr_weather": "https://api-open.data.gov.sg/v2/real-time/api/two-hr-forecast",  # res --> string ("cloudy, rainy")
-    "uv_index": "https://api-open.data.gov.sg/v2/real-time/api/uv",
-    "heat_stress": "https://api-open.data.gov.sg/v2/real-time/api/weather?api=wbgt",
+from analytics.recorder import fetch_json
+
+DATA_GOV_URL = "https://api-open.data.gov.sg"
+
+API_PATHS = {
+    "air_temp": "/v2/real-time/api/air-temperature",
+    "wind_speed": "/v2/real-time/api/wind-speed",
+    "wind_direction": "/v2/real-time/api/wind-direction",  # readings are in degrees, ie 315 degree --> Northwest
+    "relative_humidity": "/v2/real-time/api/relative-humidity",
+    "2_hr_weather": "/v2/real-time/api/two-hr-forecast",  # res --> string ("cloudy, rainy")
+    "uv_index": "/v2/real-time/api/uv",
+    "heat_stress": "/v2/real-time/api/weather?api=wbgt",
 }
 
 
+def build_api(base_url: str = DATA_GOV_URL) -> dict:
+    """Builds the endpoint mapping against a base url, eg. a local stand-in for data.gov.sg."""
+    return {key: base_url.rstrip("/") + path for key, path in API_PATHS.items()}
+
+
+API = build_api()
+
+
 INDOOR_MAPPING = {
     "Living Room": "S109",  # Ang Mo Kio Avenue 5
     "Bedroom": "S44",  # Nanyang Avenue
@@ -22,11 +33,27 @@ INDOOR_MAPPING = {
 }
 
 
-def get_weather_data(datetime, api=API) -> pd.DataFrame:
+def weather_endpoints(datetime) -> list[str]:
+    """Endpoints get_weather_data calls for a timestamp; uv index is only requested between 7am and 9pm."""
+    endpoints = ["air_temp", "wind_speed", "wind_direction", "relative_humidity"]
+    if datetime[11:13] >= "07" and datetime[11:13] <= "21":
+        endpoints.append("uv_index")
+    return endpoints
+
+
+def get_weather_data(datetime, api=API, store=None) -> pd.DataFrame:
+    responses = {
+        key: fetch_json(key, api[key] + "?date=" + datetime, datetime, store=store)
+        for key in weather_endpoints(datetime)
+    }
+    return parse_weather_data(responses)
+
+
+def parse_weather_data(responses: dict) -> pd.DataFrame:
+    """Builds the per-station weather DataFrame from the json responses of weather_endpoints."""
 
     # air temp, wind speed, wind direction, relative humidity
-    request = api["air_temp"] + "?date=" + datetime
-    response = requests.get(request).json()
+    response = responses["air_temp"]
 
     # locations
     stations = response["data"]["stations"]
@@ -45,33 +72,27 @@ def get_weather_data(datetime, api=API) -> pd.DataFrame:
     airTemp_df = pd.json_normalize(data).rename(columns={"value": "airTemp"})
 
     # wind speed
-    request2 = api["wind_speed"] + "?date=" + datetime
-    response2 = requests.get(request2).json()
+    response2 = responses["wind_speed"]
     windSpeed_df = pd.json_normalize(response2["data"]["readings"][0]["data"]).rename(
         columns={"value": "windSpeed"}
     )
 
     # wind direction
-    request3 = api["wind_direction"] + "?date=" + datetime
-    response3 = requests.get(request3).json()
+    response3 = responses["wind_direction"]
     windDirection_df = pd.json_normalize(
         response3["data"]["readings"][0]["data"]
     ).rename(columns={"value": "windDirection_deg"})
 
     # relative humidity
-    request4 = api["relative_humidity"] + "?date=" + datetime
-    response4 = requests.get(request4).json()
+    response4 = responses["relative_humidity"]
     humidity_df = pd.json_normalize(response4["data"]["readings"][0]["data"]).rename(
         columns={"value": "humidity"}
     )
 
-    # uv index
-    # check if time is in between 7am to 9pm
+    # uv index, only requested between 7am and 9pm
     uv_index = 0
-    if datetime[11:13] >= "07" and datetime[11:13] <= "21":
-        request5 = api["uv_index"] + "?date=" + datetime
-        response5 = requests.get(request5).json()
-        uv_index = response5["data"]["records"][0]["index"][0]["value"]
+    if "uv_index" in responses:
+        uv_index = responses["uv_index"]["data"]["records"][0]["index"][0]["value"]
 
     df = (
         loc_df.set_index("stationId")
@@ -0,0 +1,135 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+import httpx
+import pandas as pd
+
+from analytics.api import weather_endpoints, parse_weather_data
+from analytics.AI import AI
+from analytics.weather_service import WeatherAnalyzer
+
+
+class AsyncWeatherService:
+    """AsyncWeatherService serves the I/O-bound analytics on an asyncio event loop.
+    Upstream calls to data.gov.sg and OneMap go through a shared httpx.AsyncClient and Gemini through the
+    async genai client, so a waiting request holds no thread. The pandas/NumPy work stays in the shared
+    WeatherAnalyzer and runs on a thread pool, so results are the same as the sync Flask routes.
+    Attributes:
+        weather_service (WeatherAnalyzer): The analyzer holding the historical and current data.
+        ai_service (AI): The suggestion generator.
+        executor (ThreadPoolExecutor): Runs the CPU-bound analytics off the event loop.
+    Methods:
+        start(): Opens the upstream http client, called on app startup.
+        close(): Closes the http client and executor, called on app shutdown.
+        get_current_weather(): Refreshes the current weather without blocking the loop.
+        refresh_forever(): Refreshes the current weather every REFRESH_MINUTES, independent of requests.
+        postal_code_to_latlong(postal_code): Looks up a postal code on OneMap.
+        find_nearest_stations(postal_code, num_stations): Nearest stations to a postal code.
+        analyze_postal_code(postal_code): Hotspot analysis for a postal code.
+        generate_suggestions(postal_code, angle): AI suggestions for a postal code and house direction.
+    """
+
+    def __init__(self, weather_service: WeatherAnalyzer, ai_service: AI, config: dict):
+        self.weather_service = weather_service
+        self.ai_service = ai_service
+        self.executor = ThreadPoolExecutor(int(config.get("ANALYTICS_WORKERS") or 4))
+        self._limits = httpx.Limits(max_connections=int(config.get("UPSTREAM_MAX_CONNECTIONS") or 100))
+        self._timeout = float(config.get("UPSTREAM_TIMEOUT") or 30)
+        self._client = None
+        self._refresh_lock = None
+
+    async def start(self):
+        self._client = httpx.AsyncClient(limits=self._limits, timeout=self._timeout)
+        self._refresh_lock = asyncio.Lock()
+
+    async def close(self):
+        await self._client.aclose()
+        self.executor.shutdown(wait=False)
+
+    async def _run(self, fn, *args, **kwargs):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, partial(fn, *args, **kwargs))
+
+    async def _fetch_json(self, endpoint: str, url: str, timestamp: str = None, key: str = "", headers: dict = None) -> dict:
+        store = self.weather_service.STORE
+        if store is not None:
+            # Recording and replaying go through the on-disk store
+            return await self._run(store.fetch, endpoint, url, timestamp, key, headers)
+        response = await self._client.get(url, headers=headers)
+        return response.json()
+
+    async def get_current_weather(self) -> pd.DataFrame:
+        """
+        Refreshes the current weather if it is stale, fetching all endpoints concurrently. Concurrent
+        requests share a single refresh.
+        Returns:
+            pd.DataFrame: DataFrame containing the current weather data.
+        """
+        weather_service = self.weather_service
+        if not weather_service.is_stale(weather_service._now()):
+            return weather_service.CURRENT
+        async with self._refresh_lock:
+            datetime_now = weather_service._now()
+            if weather_service.is_stale(datetime_now):
+                datetime_str = weather_service._date_to_str(datetime_now)
+                endpoints = weather_endpoints(datetime_str)
+                responses = await asyncio.gather(
+                    *[
+                        self._fetch_json(key, weather_service.API[key] + "?date=" + datetime_str, datetime_str)
+                        for key in endpoints
+                    ]
+                )
+                weather_data = await self._run(parse_weather_data, dict(zip(endpoints, responses)))
+                await self._run(weather_service.set_current_weather, weather_data, datetime_now)
+                weather_service.date = datetime_now
+        return weather_service.CURRENT
+
+    async def refresh_forever(self):
+        """Refreshes the current weather whenever it goes stale, so snapshot listeners run without requests."""
+        while True:
+            try:
+                await asyncio.sleep(self.weather_service.seconds_until_stale())
+                await self.get_current_weather()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Error refreshing current weather: {e}")
+                await asyncio.sleep(60)
+
+    async def postal_code_to_latlong(self, postal_code: str | int) -> tuple[float, float] | None:
+        url, headers = self.weather_service.onemap_request(postal_code)
+        try:
+            data = await self._fetch_json("onemap_search", url, key=str(postal_code), headers=headers)
+        except LookupError as e:
+            # Postal code not recorded when replaying
+            print(f"Error converting postal code {postal_code}: {e}")
+            return None
+        return self.weather_service.parse_onemap_response(data, postal_code)
+
+    async def _location(self, postal_code: str | int) -> tuple[float, float]:
+        location, _ = await asyncio.gather(self.postal_code_to_latlong(postal_code), self.get_current_weather())
+        if location is None:
+            raise ValueError(f"Postal code {postal_code} not found")
+        return location
+
+    async def find_nearest_stations(self, postal_code: str | int, num_stations: int = 3) -> pd.DataFrame:
+        latitude, longitude = await self._location(postal_code)
+        return await self._run(self.weather_service.find_nearest_stations, latitude, longitude, num_stations=num_stations)
+
+    async def analyze_postal_code(self, postal_code: str | int) -> dict:
+        latitude, longitude = await self._location(postal_code)
+        return await self._run(self.weather_service.analyze_location, latitude, longitude)
+
+    async def generate_suggestions(self, postal_code: str | int, angle: int) -> dict:
+        """
+        Builds the same payload as /api/ai/suggestions.
+        Parameters:
+            postal_code (str): The postal code.
+            angle (int): The direction the house faces in degrees.
+        Returns:
+            dict: "suggestion" text and the hotspot "data" it was generated from.
+        """
+        hotspot_data = {"house_orientation": self.weather_service.angle_to_dir(angle)}
+        hotspot_data.update(await self.analyze_postal_code(postal_code))
+        suggestions = await self.ai_service.generate_suggestions_async(hotspot_data)
+        return {"suggestion": suggestions, "data": hotspot_data}
@@ -0,0 +1,211 @@
+"""
+Builds or extends the historical weather dataset by pulling readings through the same endpoints as
+analytics.api.get_weather_data, one chunk of timestamps at a time.
+
+    python -m analytics.backfill --start 2020-01-01 --end 2025-01-01 --output analytics/data/weather_history
+    python -m analytics.backfill --start 2025-01-01 --end 2025-01-08 --base-url http://127.0.0.1:8000 --csv history.csv
+
+Each completed chunk is written as a Parquet file and recorded in checkpoint.json, so an interrupted
+run resumes from the first unfinished chunk. The output directory can be used directly as
+WEATHER_DATA_PATH, or merged into a CSV with --csv.
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import pandas as pd
+import requests
+
+from analytics.api import get_weather_data, build_api, DATA_GOV_URL
+
+
+class RateLimiter:
+    """Token bucket shared by all fetch threads, allowing `rate` requests per second with bursts of `burst`."""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.RATE = rate
+        self.BURST = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.BURST, self._tokens + (now - self._updated) * self.RATE)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.RATE
+            time.sleep(wait)
+
+
+class ThrottledClient:
+    """Fetches upstream json with rate limiting and retries; passed to get_weather_data in place of a ResponseStore."""
+
+    def __init__(self, limiter: RateLimiter, retries: int = 5, backoff: float = 1.0, timeout: float = 30):
+        self.limiter = limiter
+        self.RETRIES = retries
+        self.BACKOFF = backoff
+        self.TIMEOUT = timeout
+        self._local = threading.local()
+
+    def fetch(self, endpoint: str, url: str, timestamp: str = None, key: str = "", headers: dict = None) -> dict:
+        if not hasattr(self._local, "session"):
+            self._local.session = requests.Session()
+        for attempt in range(self.RETRIES + 1):
+            self.limiter.acquire()
+            try:
+                response = self._local.session.get(url, headers=headers, timeout=self.TIMEOUT)
+                if response.status_code != 429 and response.status_code < 500:
+                    response.raise_for_status()
+                    return response.json()
+                error = requests.exceptions.HTTPError(f"{response.status_code} for {url}")
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                error = e
+            if attempt < self.RETRIES:
+                time.sleep(self.BACKOFF * 2**attempt)
+        raise error
+
+
+class Backfill:
+    """Backfill pulls readings for every timestamp in a date range and writes them as Parquet chunks.
+    Attributes:
+        OUTPUT (str): Directory holding the chunk files and checkpoint.json.
+        INTERVAL (timedelta): Spacing between requested timestamps.
+        CHUNK (timedelta): Span of timestamps written to each chunk file.
+        WORKERS (int): Maximum number of timestamps fetched concurrently.
+    Methods:
+        chunks(start, end): Splits the date range into chunk start/end pairs.
+        run(start, end): Fetches and writes every chunk not already in the checkpoint.
+        to_csv(path): Merges the chunks into a CSV in the layout of weather_data_5years.csv.
+    """
+
+    def __init__(
+        self,
+        output: str,
+        interval: timedelta = timedelta(hours=1),
+        chunk: timedelta = timedelta(days=1),
+        workers: int = 8,
+        rate: float = 20,
+        base_url: str = DATA_GOV_URL,
+    ):
+        self.OUTPUT = output
+        self.INTERVAL = interval
+        self.CHUNK = chunk
+        self.WORKERS = workers
+        self.API = build_api(base_url)
+        self.client = ThrottledClient(RateLimiter(rate, burst=workers))
+        self._checkpoint_path = os.path.join(output, "checkpoint.json")
+        os.makedirs(output, exist_ok=True)
+        self.completed = self._load_checkpoint()
+
+    def _load_checkpoint(self) -> set:
+        if not os.path.exists(self._checkpoint_path):
+            return set()
+        with open(self._checkpoint_path) as f:
+            return set(json.load(f)["completed"])
+
+    def _save_checkpoint(self):
+        tmp_path = self._checkpoint_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"completed": sorted(self.completed)}, f, indent=4)
+        os.replace(tmp_path, self._checkpoint_path)
+
+    def chunks(self, start: datetime, end: datetime) -> list[tuple[datetime, datetime]]:
+        """Splits [start, end) into consecutive chunks of CHUNK."""
+        bounds = []
+        while start < end:
+            bounds.append((start, min(start + self.CHUNK, end)))
+            start += self.CHUNK
+        return bounds
+
+    def _chunk_name(self, start: datetime) -> str:
+        return "chunk_" + start.strftime("%Y%m%dT%H%M%S") + ".parquet"
+
+    def _fetch(self, timestamp: datetime) -> pd.DataFrame:
+        date = timestamp.strftime("%Y-%m-%dT%H:%M:%S")
+        df = get_weather_data(date, self.API, self.client)
+        df["date"] = date
+        return df
+
+    def _run_chunk(self, pool: ThreadPoolExecutor, start: datetime, end: datetime) -> str:
+        name = self._chunk_name(start)
+        timestamps = pd.date_range(start, end, freq=self.INTERVAL, inclusive="left").to_pydatetime()
+        frames = list(pool.map(self._fetch, timestamps))
+        df = pd.concat(frames, ignore_index=True)
+
+        # Write then rename, so a chunk file is never partially written
+        path = os.path.join(self.OUTPUT, name)
+        df.to_parquet(path + ".tmp", index=False)
+        os.replace(path + ".tmp", path)
+        return name
+
+    def run(self, start: datetime, end: datetime):
+        """
+        Fetches and writes every chunk of [start, end) not already in the checkpoint. A chunk with any
+        failed timestamp is not written, so it is retried in full on the next run.
+        Parameters:
+            start (datetime): First timestamp to fetch.
+            end (datetime): End of the range, exclusive.
+        """
+        pending = [c for c in self.chunks(start, end) if self._chunk_name(c[0]) not in self.completed]
+        print(f"Backfill: {len(pending)} chunks to fetch, {len(self.completed)} already completed")
+        failed = 0
+        with ThreadPoolExecutor(self.WORKERS) as pool:
+            for i, (chunk_start, chunk_end) in enumerate(pending, 1):
+                began = time.perf_counter()
+                try:
+                    name = self._run_chunk(pool, chunk_start, chunk_end)
+                except Exception as e:
+                    failed += 1
+                    print(f"Error fetching chunk {chunk_start} - {chunk_end}: {e}")
+                    continue
+                self.completed.add(name)
+                self._save_checkpoint()
+                print(f"[{i}/{len(pending)}] {name} in {time.perf_counter() - began:.1f}s")
+        if failed:
+            print(f"Backfill: {failed} chunks failed, run again to retry them")
+
+    def to_csv(self, path: str):
+        """Merges the completed chunks into a CSV in the layout of weather_data_5years.csv."""
+        files = [os.path.join(self.OUTPUT, name) for name in sorted(self.completed)]
+        df = pd.concat([pd.read_parquet(f) for f in files], ignore_index=True)
+        df.sort_values(["date", "stationId"]).to_csv(path, index=False)
+        print(f"Wrote {len(df)} rows to {path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--start", required=True, type=datetime.fromisoformat)
+    parser.add_argument("--end", required=True, type=datetime.fromisoformat)
+    parser.add_argument("--output", default=os.path.join(os.path.dirname(__file__), "data", "weather_history"))
+    parser.add_argument("--interval-minutes", type=int, default=60)
+    parser.add_argument("--chunk-hours", type=int, default=24)
+    parser.add_argument("--workers", type=int, default=8, help="Timestamps fetched concurrently")
+    parser.add_argument("--rate", type=float, default=20, help="Maximum upstream requests per second")
+    parser.add_argument("--base-url", default=DATA_GOV_URL, help="data.gov.sg base url, eg. a local stub")
+    parser.add_argument("--csv", help="Also merge all completed chunks into this CSV")
+    args = parser.parse_args()
+
+    backfill = Backfill(
+        args.output,
+        interval=timedelta(minutes=args.interval_minutes),
+        chunk=timedelta(hours=args.chunk_hours),
+        workers=args.workers,
+        rate=args.rate,
+        base_url=args.base_url,
+    )
+    backfill.run(args.start, args.end)
+    if args.csv:
+        backfill.to_csv(args.csv)
+
+
+if __name__ == "__main__":
+    main()
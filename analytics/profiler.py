@@ -0,0 +1,123 @@
+import cProfile
+import hmac
+import io
+import json
+import os
+import pstats
+import random
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+
+# Allocations are only listed when the repo's own code is on their traceback
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class RequestProfiler:
+    """RequestProfiler captures a cProfile call profile and a tracemalloc allocation snapshot for
+    individual requests, and writes them to a profile directory along with the request parameters.
+    A request is profiled when it carries the configured token in the X-Profile-Token header, or
+    when it is picked by the sampling rate. When neither is configured the only cost per request
+    is a couple of attribute checks.
+    tracemalloc traces the whole process, so the allocation stats also include other requests
+    running at the same time, which pay the tracing overhead too. The listed sites are limited to
+    allocations made from the repo's code, and the peak memory is process wide.
+    Attributes:
+        TOKEN (str): Value the X-Profile-Token header must match, or None to disable header triggering.
+        SAMPLE_RATE (float): Fraction of requests to profile at random.
+        DIRECTORY (str): Directory profiles are written to.
+        TOP_N (int): Number of functions/allocation sites listed in the text summary.
+    Methods:
+        should_profile(headers): Decides whether a request is profiled.
+        start(): Starts profiling the current request, returns None if another request is being profiled.
+        stop(session, meta): Stops profiling and writes the profile files.
+    """
+
+    HEADER = "X-Profile-Token"
+    TRACE_FRAMES = 10
+
+    def __init__(self, config: dict):
+        self.TOKEN = config.get("PROFILE_TOKEN") or None
+        self.SAMPLE_RATE = float(config.get("PROFILE_SAMPLE_RATE") or 0)
+        self.DIRECTORY = config.get("PROFILE_DIR") or "profiles"
+        self.TOP_N = int(config.get("PROFILE_TOP_N") or 30)
+        self.enabled = self.TOKEN is not None or self.SAMPLE_RATE > 0
+        # tracemalloc is process wide, so only one request is profiled at a time
+        self._lock = threading.Lock()
+
+    def should_profile(self, headers) -> bool:
+        """
+        Decides whether a request is profiled.
+        Parameters:
+            headers: The request headers.
+        Returns:
+            bool: True if the request should be profiled.
+        """
+        if not self.enabled:
+            return False
+        token = headers.get(self.HEADER)
+        if self.TOKEN is not None and token is not None and hmac.compare_digest(token.encode(), self.TOKEN.encode()):
+            return True
+        return self.SAMPLE_RATE > 0 and random.random() < self.SAMPLE_RATE
+
+    def start(self) -> dict | None:
+        """
+        Starts the call profiler and allocation tracing.
+        Returns:
+            dict: Profiling session to hand back to stop(), or None if another request is already being profiled.
+        """
+        if not self._lock.acquire(blocking=False):
+            return None
+        tracemalloc.start(self.TRACE_FRAMES)
+        profile = cProfile.Profile()
+        session = {"profile": profile, "start": time.perf_counter()}
+        profile.enable()
+        return session
+
+    def stop(self, session: dict, meta: dict) -> str:
+        """
+        Stops profiling and writes <name>.prof (pstats), <name>.txt (summary) and <name>.json (request parameters).
+        Parameters:
+            session (dict): Session returned by start().
+            meta (dict): Request details to record, eg. path, args and status.
+        Returns:
+            str: The path prefix the profile was written to.
+        """
+        try:
+            session["profile"].disable()
+            duration = time.perf_counter() - session["start"]
+            snapshot = tracemalloc.take_snapshot().filter_traces(
+                [tracemalloc.Filter(True, os.path.join(ROOT, "*"), all_frames=True), tracemalloc.Filter(False, __file__)]
+            )
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+        finally:
+            self._lock.release()
+
+        os.makedirs(self.DIRECTORY, exist_ok=True)
+        name = "{}_{}".format(
+            datetime.now().strftime("%Y%m%dT%H%M%S%f"),
+            meta.get("endpoint") or "request",
+        )
+        prefix = os.path.join(self.DIRECTORY, name)
+
+        session["profile"].dump_stats(prefix + ".prof")
+
+        summary = io.StringIO()
+        pstats.Stats(session["profile"], stream=summary).sort_stats("cumulative").print_stats(self.TOP_N)
+        summary.write(
+            f"\nTop {self.TOP_N} allocation sites called from {ROOT}, traced across the whole process while the request ran"
+            f" including concurrent requests (process peak traced memory {peak / 1024:.1f} KiB)\n"
+        )
+        for stat in snapshot.statistics("lineno")[: self.TOP_N]:
+            summary.write(f"{stat}\n")
+        with open(prefix + ".txt", "w") as f:
+            f.write(summary.getvalue())
+
+        meta = dict(meta, duration_s=round(duration, 6), traced_memory_peak=peak, traced_memory_current=current)
+        with open(prefix + ".json", "w") as f:
+            json.dump(meta, f, indent=4, default=str)
+
+        print(f"Profile written to {prefix}.*")
+        return prefix
@@ -0,0 +1,113 @@
+import bisect
+import hashlib
+import json
+import os
+import threading
+
+import requests
+
+
+class ResponseStore:
+    """ResponseStore is a content-addressed on-disk store of raw upstream responses, used to record
+    live responses and to replay them later without touching the network.
+    Response bodies are written once to blobs/<sha256> and an append-only index.jsonl maps
+    (endpoint, key, timestamp) to the blob, so repeated identical responses are stored once.
+    Attributes:
+        ROOT (str): Directory holding the index and blobs.
+        MODE (str): "record" to fetch and store responses, "replay" to serve only from the store.
+    Methods:
+        fetch(endpoint, url, timestamp, key, headers): Returns the json body for a request, recording or replaying it.
+        lookup(endpoint, timestamp, key): Finds the latest recorded response at or before a timestamp.
+        timestamps(endpoint): Lists the recorded timestamps for an endpoint.
+    """
+
+    MODES = ("record", "replay")
+
+    def __init__(self, root: str, mode: str = "record"):
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown mode {mode}, expected one of {self.MODES}")
+        self.ROOT = root
+        self.MODE = mode
+        self._blobs = os.path.join(root, "blobs")
+        self._index_path = os.path.join(root, "index.jsonl")
+        self._lock = threading.Lock()
+        # (endpoint, key) -> sorted list of (timestamp, sha)
+        self._index = {}
+        os.makedirs(self._blobs, exist_ok=True)
+        self._load_index()
+
+    def _load_index(self):
+        if not os.path.exists(self._index_path):
+            return
+        with open(self._index_path) as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    self._add(entry["endpoint"], entry["key"], entry["timestamp"], entry["sha"])
+
+    def _add(self, endpoint: str, key: str, timestamp: str, sha: str):
+        entries = self._index.setdefault((endpoint, key), [])
+        bisect.insort(entries, (timestamp, sha))
+
+    def _save(self, endpoint: str, key: str, timestamp: str, content: bytes):
+        sha = hashlib.sha256(content).hexdigest()
+        blob_path = os.path.join(self._blobs, sha)
+        with self._lock:
+            if not os.path.exists(blob_path):
+                with open(blob_path, "wb") as f:
+                    f.write(content)
+            with open(self._index_path, "a") as f:
+                entry = {"endpoint": endpoint, "key": key, "timestamp": timestamp, "sha": sha}
+                f.write(json.dumps(entry) + "\n")
+            self._add(endpoint, key, timestamp, sha)
+
+    def lookup(self, endpoint: str, timestamp: str = None, key: str = "") -> dict:
+        """
+        Finds the latest recorded response at or before the timestamp.
+        Parameters:
+            endpoint (str): Name of the upstream endpoint, eg. "air_temp".
+            timestamp (str, optional): "%Y-%m-%dT%H:%M:%S" timestamp; the latest recording is used if None.
+            key (str, optional): Distinguishes requests to the same endpoint, eg. a postal code.
+        Returns:
+            dict: The recorded json body.
+        """
+        entries = self._index.get((endpoint, key), [])
+        if timestamp is None:
+            i = len(entries)
+        else:
+            i = bisect.bisect_right(entries, timestamp, key=lambda entry: entry[0])
+        if i == 0:
+            raise LookupError(f"No recorded response for {endpoint} {key} at or before {timestamp}")
+        with open(os.path.join(self._blobs, entries[i - 1][1]), "rb") as f:
+            return json.loads(f.read())
+
+    def timestamps(self, endpoint: str, key: str = "") -> list[str]:
+        """Lists the recorded timestamps for an endpoint, oldest first."""
+        return [timestamp for timestamp, _ in self._index.get((endpoint, key), [])]
+
+    def fetch(self, endpoint: str, url: str, timestamp: str = None, key: str = "", headers: dict = None) -> dict:
+        """
+        Returns the json body for a request, fetching and recording it in record mode or reading
+        it from the store in replay mode.
+        Parameters:
+            endpoint (str): Name of the upstream endpoint, eg. "air_temp".
+            url (str): Full request url.
+            timestamp (str, optional): Timestamp the request is for.
+            key (str, optional): Distinguishes requests to the same endpoint, eg. a postal code.
+            headers (dict, optional): Request headers, not recorded.
+        Returns:
+            dict: The json body.
+        """
+        if self.MODE == "replay":
+            return self.lookup(endpoint, timestamp, key)
+        response = requests.get(url, headers=headers)
+        if response.ok:
+            self._save(endpoint, key, timestamp or "", response.content)
+        return response.json()
+
+
+def fetch_json(endpoint: str, url: str, timestamp: str = None, key: str = "", headers: dict = None, store: ResponseStore = None) -> dict:
+    """Fetches a json body directly, or through the store (or any object with the same fetch method) when one is given."""
+    if store is None:
+        return requests.get(url, headers=headers).json()
+    return store.fetch(endpoint, url, timestamp, key, headers)
@@ -0,0 +1,101 @@
+import threading
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+
+class SnapshotBuffer:
+    """SnapshotBuffer keeps the most recent per-station weather snapshots in a fixed-size NumPy ring buffer.
+    Every snapshot is written twice, at slot i and slot i + capacity of a 2 * capacity array, so the latest
+    n snapshots are always one contiguous slice and can be returned as views without copying.
+    Views are only valid until the next append; take a copy to keep them longer.
+    Attributes:
+        CAPACITY (int): Number of snapshots kept.
+        FIELDS (list): Columns stored for each station.
+        STATIONS (dict): Maps stationId to its column in the buffer.
+    Methods:
+        append(timestamp, df): Stores a snapshot in O(1).
+        latest(n): Returns views of the latest n timestamps and values.
+        station_series(station_id, since): Returns the recent readings of one station as a dict of lists.
+    """
+
+    FIELDS = ["airTemp", "humidity", "windSpeed", "wbgt"]
+
+    def __init__(self, capacity: int, max_stations: int = 128, fields: list = None):
+        self.CAPACITY = capacity
+        self.FIELDS = fields or self.FIELDS
+        self.STATIONS = {}
+        self._max_stations = max_stations
+        self._timestamps = np.full(2 * capacity, np.nan)
+        self._values = np.full((2 * capacity, max_stations, len(self.FIELDS)), np.nan)
+        self._count = 0
+        self.lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return min(self._count, self.CAPACITY)
+
+    def _columns(self, station_ids) -> np.ndarray:
+        for station_id in station_ids:
+            if station_id not in self.STATIONS and len(self.STATIONS) < self._max_stations:
+                self.STATIONS[station_id] = len(self.STATIONS)
+        return np.array([self.STATIONS.get(s, -1) for s in station_ids], dtype=int)
+
+    def append(self, timestamp: datetime, df: pd.DataFrame) -> bool:
+        """
+        Stores a snapshot, overwriting the oldest one once the buffer is full.
+        Snapshots not newer than the latest stored one are ignored to keep the buffer in time order.
+        Parameters:
+            timestamp (datetime): Time of the snapshot.
+            df (pd.DataFrame): Snapshot with a 'stationId' column and the buffer's FIELDS.
+        Returns:
+            bool: Whether the snapshot was stored.
+        """
+        with self.lock:
+            if self._count and timestamp.timestamp() <= self.latest(1)[0][0]:
+                return False
+            columns = self._columns(df["stationId"])
+            known = columns >= 0
+            row = np.full((self._max_stations, len(self.FIELDS)), np.nan)
+            row[columns[known]] = df[self.FIELDS].to_numpy(dtype=float)[known]
+
+            i = self._count % self.CAPACITY
+            for slot in (i, i + self.CAPACITY):
+                self._timestamps[slot] = timestamp.timestamp()
+                self._values[slot] = row
+            self._count += 1
+            return True
+
+    def latest(self, n: int = None) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Returns views of the latest n snapshots, oldest first.
+        Parameters:
+            n (int, optional): Number of snapshots; all stored snapshots if None.
+        Returns:
+            tuple: Timestamps (epoch seconds) of shape (n,) and values of shape (n, max_stations, len(FIELDS)).
+        """
+        n = len(self) if n is None else min(n, len(self))
+        end = (self._count - 1) % self.CAPACITY + self.CAPACITY + 1
+        return self._timestamps[end - n:end], self._values[end - n:end]
+
+    def station_series(self, station_id: str, since: datetime = None) -> dict:
+        """
+        Returns the recent readings of one station.
+        Parameters:
+            station_id (str): The station to read.
+            since (datetime, optional): Only include snapshots at or after this time.
+        Returns:
+            dict: "timestamp" (ISO strings) and one list per field, oldest first.
+        """
+        with self.lock:
+            if station_id not in self.STATIONS:
+                raise ValueError(f"No recent readings for station {station_id}")
+            timestamps, values = self.latest()
+            start = 0 if since is None else np.searchsorted(timestamps, since.timestamp())
+            series = values[start:, self.STATIONS[station_id]]
+            result = {
+                "timestamp": [datetime.fromtimestamp(t).isoformat() for t in timestamps[start:]],
+            }
+            for j, field in enumerate(self.FIELDS):
+                result[field] = [None if np.isnan(v) else round(float(v), 3) for v in series[:, j]]
+            return result
@@ -0,0 +1,84 @@
+import numpy as np
+
+# data.gov.sg reports wind speed in knots
+KNOTS_TO_MS = 0.514444
+
+# Rough clear-sky conversion from UV index to global horizontal irradiance (W/m^2) at Singapore's latitude
+SOLAR_PER_UV = 85.0
+MAX_SOLAR = 1100.0
+
+# Standard 150 mm black globe
+GLOBE_DIAMETER = 0.15
+GLOBE_ABSORPTIVITY = 0.95
+GLOBE_EMISSIVITY = 0.95
+STEFAN_BOLTZMANN = 5.67e-8
+
+
+def solar_from_uv(uv_index) -> np.ndarray:
+    """
+    Estimates global horizontal solar irradiance from the UV index.
+    Parameters:
+        uv_index (array-like): UV index readings.
+    Returns:
+        np.ndarray: Estimated irradiance in W/m^2.
+    """
+    return np.clip(np.asarray(uv_index, dtype=float) * SOLAR_PER_UV, 0, MAX_SOLAR)
+
+
+def wet_bulb_temperature(air_temp, humidity) -> np.ndarray:
+    """
+    Psychrometric wet bulb temperature from air temperature and relative humidity (Stull, 2011).
+    Parameters:
+        air_temp (array-like): Air temperature in °C.
+        humidity (array-like): Relative humidity in %.
+    Returns:
+        np.ndarray: Wet bulb temperature in °C.
+    """
+    t = np.asarray(air_temp, dtype=float)
+    rh = np.clip(np.asarray(humidity, dtype=float), 5, 99)
+    return (
+        t * np.arctan(0.151977 * np.sqrt(rh + 8.313659))
+        + np.arctan(t + rh)
+        - np.arctan(rh - 1.676331)
+        + 0.00391838 * rh**1.5 * np.arctan(0.023101 * rh)
+        - 4.686035
+    )
+
+
+def globe_temperature(air_temp, wind_speed, solar) -> np.ndarray:
+    """
+    Black globe temperature from a linearised heat balance of the globe: absorbed sunlight on its
+    projected area against convective (ISO 7726 coefficient) and radiative losses over its surface.
+    Parameters:
+        air_temp (array-like): Air temperature in °C.
+        wind_speed (array-like): Wind speed in m/s.
+        solar (array-like): Global horizontal irradiance in W/m^2.
+    Returns:
+        np.ndarray: Globe temperature in °C.
+    """
+    t = np.asarray(air_temp, dtype=float)
+    # Globes are never in perfectly still air
+    v = np.maximum(np.asarray(wind_speed, dtype=float), 0.1)
+    h_convective = 1.1e8 * STEFAN_BOLTZMANN * v**0.6 / GLOBE_DIAMETER**0.4
+    h_radiative = 4 * GLOBE_EMISSIVITY * STEFAN_BOLTZMANN * (t + 273.15) ** 3
+    absorbed = GLOBE_ABSORPTIVITY * np.asarray(solar, dtype=float) / 4
+    return t + absorbed / (h_convective + h_radiative)
+
+
+def wbgt(air_temp, humidity, wind_speed, uv_index=0) -> np.ndarray:
+    """
+    Outdoor wet bulb globe temperature, WBGT = 0.7 Tw + 0.2 Tg + 0.1 Ta, for arrays of readings.
+    The psychrometric wet bulb stands in for the natural wet bulb, and solar load is estimated from
+    the UV index, so with uv_index 0 this is the shaded WBGT.
+    Parameters:
+        air_temp (array-like): Air temperature in °C.
+        humidity (array-like): Relative humidity in %.
+        wind_speed (array-like): Wind speed in m/s.
+        uv_index (array-like, optional): UV index. Default is 0.
+    Returns:
+        np.ndarray: WBGT in °C.
+    """
+    t = np.asarray(air_temp, dtype=float)
+    tw = wet_bulb_temperature(t, humidity)
+    tg = globe_temperature(t, wind_speed, solar_from_uv(uv_index))
+    return 0.7 * tw + 0.2 * tg + 0.1 * t
@@ -1,15 +1,22 @@
 import os
+import glob
+import threading
+import time
 import numpy as np
 import pandas as pd
-import requests
 from datetime import datetime, timedelta
 from dotenv import dotenv_values
 from geopy.distance import geodesic
 from sklearn.preprocessing import MinMaxScaler
 from scipy.stats import percentileofscore
 
-from analytics.api import get_weather_data
-from analytics.api import INDOOR_MAPPING 
+from analytics.api import get_weather_data, build_api
+from analytics.api import INDOOR_MAPPING, DATA_GOV_URL
+from analytics.recorder import ResponseStore, fetch_json
+from analytics.wbgt import wbgt, KNOTS_TO_MS
+from analytics.ring_buffer import SnapshotBuffer
+
+ONEMAP_URL = "https://www.onemap.gov.sg"
 
 
 class WeatherAnalyzer:
@@ -23,19 +30,35 @@ class WeatherAnalyzer:
         DATA (pd.DataFrame): Processed historical weather data.
         CURRENT (pd.DataFrame): Cached current weather data.
         date (datetime): Timestamp of the last fetched current weather data.
+        STORE (ResponseStore): Record/replay store for upstream responses, or None to always call the live APIs.
+        REPLAY_TIMESTAMP (str): Recorded timestamp served in replay mode, or None for the latest recording.
+        REFRESH_MINUTES (int): How long the current weather is cached before it is fetched again.
+        RECENT (SnapshotBuffer): The last TREND_HOURS of current weather snapshots, one per refresh.
+        LISTENERS (list): Callables run with (timestamp, snapshot) whenever a new snapshot lands.
     Methods:
         __init__(): Initializes the WeatherAnalyzer instance, loads configurations, processes historical data, and fetches current weather.
         _load_and_process_historical_data(): Loads and processes historical weather data from a CSV file.
         _process_weather_data(df, historical): Normalizes weather data and computes heat scores.
         get_current_weather(mock): Fetches the current weather data, with an option to mock data for testing.
+        is_stale(datetime_now): Checks whether the current weather is due for a refresh.
+        set_current_weather(weather_data, datetime_now, mock): Processes and stores a freshly fetched snapshot.
+        seconds_until_stale(): Seconds until the current weather is due for a refresh.
+        start_refresher(): Refreshes the current weather on a background thread, independent of requests.
         _date_to_str(date_obj): Converts a datetime object to a formatted string.
+        _now(): Returns the current time, or the replayed time in replay mode.
+        travel_to(timestamp): Switches replay to a recorded timestamp and reloads the current weather.
+        get_recent_trend(station_id, room, hours): Returns the recent snapshots of a station or room from RECENT.
         postal_code_to_latlong(postal_code): Converts a postal code to latitude and longitude using the OneMap API.
+        onemap_request(postal_code): Builds the OneMap search url and headers.
+        parse_onemap_response(data, postal_code): Extracts the latitude and longitude from a OneMap response.
         find_nearest_stations(latitude, longitude, num_stations): Finds the nearest weather stations to a given location.
         __compute_distance(df, latitude, longitude): Computes the geodesic distance between a location and weather stations.
         __compute_weights(df): Computes weights for weather stations based on their distance.
         __compute_weighted_heat_score(df): Computes the weighted heat score for a set of weather stations.
         find_threshold(historical_data, percentile_threshold): Determines the heat score threshold based on historical data and a percentile.
         is_hotspot(nearest_stations, latitude, longitude, percentile_threshold): Determines if a location is a heat hotspot based on weighted heat scores.
+        analyze_postal_code(postal_code, num_stations): Runs the hotspot analysis for a postal code, as served by /api/weather/user/analysis.
+        analyze_location(latitude, longitude, num_stations): Runs the hotspot analysis for a location.
         __filter_data(nearest_stations): Filters historical data to include only records from the nearest weather stations.
     """
 
@@ -45,31 +68,56 @@ class WeatherAnalyzer:
         Loads configuration, processes historical weather data, and initializes scalers.
         """
         print("WeatherAnalyzer initialized")
-        self.CONFIG = dotenv_values(".env")
+        self.CONFIG = config or dotenv_values(".env")
+        self.API = build_api(self.CONFIG.get("DATA_GOV_URL") or DATA_GOV_URL)
+        self.STORE = self._create_store()
+        self.REPLAY_TIMESTAMP = self.CONFIG.get("REPLAY_TIMESTAMP") or None
+        self.REFRESH_MINUTES = int(self.CONFIG.get("REFRESH_MINUTES") or 5)
+        trend_hours = int(self.CONFIG.get("TREND_HOURS") or 48)
+        self.RECENT = SnapshotBuffer(trend_hours * 60 // max(self.REFRESH_MINUTES, 1))
+        self.LISTENERS = []
         self.scaler = MinMaxScaler()
         self.scaler_heat = MinMaxScaler()
         self.DATA = self._load_and_process_historical_data()
         self.CURRENT = None
-        self.date = datetime.now()
+        self.date = self._now()
         self.CURRENT = self.get_current_weather()
-        self.CONFIG = config
+
+    def _create_store(self) -> ResponseStore | None:
+        """
+        Creates the record/replay store from the UPSTREAM_MODE ("live", "record" or "replay") and RECORD_DIR settings.
+        Returns:
+            ResponseStore: The store, or None in live mode.
+        """
+        mode = self.CONFIG.get("UPSTREAM_MODE") or "live"
+        if mode == "live":
+            return None
+        base_path = os.path.dirname(__file__)
+        root = self.CONFIG.get("RECORD_DIR") or os.path.join(base_path, "data", "recordings")
+        return ResponseStore(root, mode)
 
     def _load_and_process_historical_data(self) -> pd.DataFrame:
         """
-        Loads and processes historical weather data.
+        Loads and processes historical weather data, from a CSV or a directory of backfill Parquet chunks.
         Returns:
             pd.DataFrame: Processed historical weather data.
         """
         base_path = os.path.dirname(__file__)  # gets the directory of weather_service.py
-        file_path = os.path.join(base_path, 'data', 'weather_data_5years.csv')
-        DATA = pd.read_csv(file_path)
+        file_path = self.CONFIG.get("WEATHER_DATA_PATH") or os.path.join(base_path, 'data', 'weather_data_5years.csv')
+        if os.path.isdir(file_path):
+            DATA = pd.concat(
+                [pd.read_parquet(f) for f in sorted(glob.glob(os.path.join(file_path, "chunk_*.parquet")))],
+                ignore_index=True,
+            )
+        else:
+            DATA = pd.read_csv(file_path)
         DATA[["date", "time"]] = DATA["date"].str.split("T", expand=True)
         DATA.rename(columns={"lon": "longitude", "lat": "latitude"}, inplace=True)
         return self._process_weather_data(DATA, historical=True)
 
     def _process_weather_data(self, df: pd.DataFrame, historical: bool) -> pd.DataFrame:
         """
-        Normalizes weather data and computes heat score.
+        Normalizes weather data and computes heat score and WBGT.
         Parameters:
             df (pd.DataFrame): DataFrame containing weather data with columns 'airTemp', 'humidity', and 'windSpeed'.
             historical (bool): Whether the data is historical or current.
@@ -96,6 +144,10 @@ class WeatherAnalyzer:
             )
             df["heat_score_norm"] = self.scaler_heat.transform(df[["heat_score"]])
 
+        # Historical rows without a UV reading get the shaded WBGT
+        uv_index = df["uv_index"].fillna(0) if "uv_index" in df else 0
+        df["wbgt"] = wbgt(df["airTemp"], df["humidity"], df["windSpeed"] * KNOTS_TO_MS, uv_index)
+
         return df
 
     def get_current_weather(self, mock: bool = False) -> pd.DataFrame:
@@ -106,19 +158,78 @@ class WeatherAnalyzer:
         Returns:
             pd.DataFrame: DataFrame containing the current weather data.
         """
-        datetime_now = datetime.now()
-        if self.CURRENT is None or self.date - datetime_now > timedelta(minutes=5):
+        datetime_now = self._now()
+        if self.is_stale(datetime_now):
+            self.date = datetime_now
             datetime_str = self._date_to_str(datetime_now)
-            weather_data = get_weather_data(datetime_str)
-            weather_data.rename(
-                columns={"lat": "latitude", "lon": "longitude"}, inplace=True
-            )
-            if mock:
-                weather_data.loc[weather_data["stationId"] == "S50", "airTemp"] = 33
-            self.CURRENT = self._process_weather_data(weather_data, historical=False)
+            weather_data = get_weather_data(datetime_str, self.API, self.STORE)
+            self.set_current_weather(weather_data, datetime_now, mock)
 
         return self.CURRENT
 
+    def is_stale(self, datetime_now: datetime) -> bool:
+        """
+        Checks whether the cached current weather is due for a refresh.
+        Parameters:
+            datetime_now (datetime): The current time, see _now().
+        Returns:
+            bool: True if there is no current weather or it is older than REFRESH_MINUTES.
+        """
+        return self.CURRENT is None or datetime_now - self.date > timedelta(minutes=self.REFRESH_MINUTES)
+
+    def seconds_until_stale(self) -> float:
+        """
+        Seconds until the current weather is due for a refresh, see is_stale().
+        Returns:
+            float: Seconds to wait, at least 1.
+        """
+        due = self.date + timedelta(minutes=self.REFRESH_MINUTES) - self._now()
+        return max(due.total_seconds(), 0) + 1
+
+    def start_refresher(self) -> threading.Thread:
+        """
+        Starts a daemon thread that refreshes the current weather every REFRESH_MINUTES, so LISTENERS
+        are notified even when no request comes in.
+        Returns:
+            threading.Thread: The refresher thread.
+        """
+        def refresh():
+            while True:
+                try:
+                    time.sleep(self.seconds_until_stale())
+                    self.get_current_weather()
+                except Exception as e:
+                    print(f"Error refreshing current weather: {e}")
+                    time.sleep(60)
+
+        thread = threading.Thread(target=refresh, name="weather-refresher", daemon=True)
+        thread.start()
+        return thread
+
+    def set_current_weather(self, weather_data: pd.DataFrame, datetime_now: datetime, mock: bool = False) -> pd.DataFrame:
+        """
+        Processes freshly fetched weather data into the current snapshot, stores it and notifies LISTENERS.
+        Parameters:
+            weather_data (pd.DataFrame): Output of get_weather_data.
+            datetime_now (datetime): Time of the snapshot.
+            mock (bool): Whether to mock the data for testing purposes.
+        Returns:
+            pd.DataFrame: The processed current weather data.
+        """
+        weather_data.rename(
+            columns={"lat": "latitude", "lon": "longitude"}, inplace=True
+        )
+        if mock:
+            weather_data.loc[weather_data["stationId"] == "S50", "airTemp"] = 33
+        self.CURRENT = self._process_weather_data(weather_data, historical=False)
+        self.RECENT.append(datetime_now, self.CURRENT)
+        for listener in self.LISTENERS:
+            try:
+                listener(datetime_now, self.CURRENT)
+            except Exception as e:
+                print(f"Error in snapshot listener {listener}: {e}")
+        return self.CURRENT
+
     def _date_to_str(self, date_obj: datetime) -> str:
         """
         Converts a datetime object to a string in the required format.
@@ -129,10 +240,49 @@ class WeatherAnalyzer:
         """
         return date_obj.strftime("%Y-%m-%dT%H:%M:%S")
 
+    def _now(self) -> datetime:
+        """
+        Returns the current time, or in replay mode the replayed timestamp (the latest recording unless one was chosen).
+        Returns:
+            datetime: The current or replayed time.
+        """
+        if self.STORE is None or self.STORE.MODE != "replay":
+            return datetime.now()
+        timestamp = self.REPLAY_TIMESTAMP
+        if timestamp is None:
+            recorded = self.STORE.timestamps("air_temp")
+            if not recorded:
+                raise LookupError(f"No recorded weather data in {self.STORE.ROOT}")
+            timestamp = recorded[-1]
+        return datetime.strptime(timestamp, "%Y-%m-%dT%H:%M:%S")
+
+    def travel_to(self, timestamp: str) -> pd.DataFrame:
+        """
+        Switches replay to the given recorded timestamp and reloads the current weather from the store.
+        Parameters:
+            timestamp (str): Timestamp in "%Y-%m-%dT%H:%M:%S" format; the latest recording at or before it is served.
+        Returns:
+            pd.DataFrame: The current weather data at that time.
+        """
+        if self.STORE is None or self.STORE.MODE != "replay":
+            raise ValueError("Time travel is only available in replay mode")
+        # Raises LookupError before any state changes if nothing was recorded at or before the timestamp
+        self.STORE.lookup("air_temp", timestamp)
+        previous = self.REPLAY_TIMESTAMP, self.date, self.CURRENT
+        self.REPLAY_TIMESTAMP = timestamp
+        self.date = self._now()
+        self.CURRENT = None
+        try:
+            return self.get_current_weather()
+        except Exception:
+            self.REPLAY_TIMESTAMP, self.date, self.CURRENT = previous
+            raise
+
     
     def get_forecast_df(self, location: str = None) -> pd.DataFrame:
-        url = self.CONFIG["2_hr_weather"] + "?date=" + self.CONFIG["CURRENT_DATETIME"]
-        response = requests.get(url).json()
+        datetime_str = self._date_to_str(self._now())
+        url = self.API["2_hr_weather"] + "?date=" + datetime_str
+        response = fetch_json("2_hr_weather", url, datetime_str, store=self.STORE)
 
         area_metadata = pd.json_normalize(response["data"]["area_metadata"])
         forecasts = pd.json_normalize(response["data"]["items"][0]["forecasts"])
@@ -156,7 +306,7 @@ class WeatherAnalyzer:
         station_to_room = {v: k for k, v in INDOOR_MAPPING.items()}
 
         # Copy and map
-        df = self.CURRENT.copy()
+        df = self.get_current_weather().copy()
         df["room"] = df["stationId"].map(station_to_room)
 
         # Keep only rows where room is mapped (not NaN)
@@ -169,19 +319,32 @@ class WeatherAnalyzer:
         # Replace all wind directions with Living Room's wind dir
         df["windDirection_dir"] = wind_dir
 
-        # Uses panda vectorizer to loop through each row
-        df["heatStress"] = (
-            0.726330 * df["airTemp"] +
-            0.012713 * df["windSpeed"] +
-            0.109697 * df["humidity"] -
-            5.12977
-        ).round(3)
+        df["heatStress"] = df["wbgt"].round(3)
 
         # Select only required columns
         final_df = df[["room", "airTemp", "humidity", "windSpeed", "windDirection_dir", "heatStress"]].reset_index(drop=True)
 
         return final_df
     
+    def get_recent_trend(self, station_id: str = None, room: str = None, hours: int = None) -> dict:
+        """
+        Returns the recent snapshots of a station or room, read from memory only.
+        Parameters:
+            station_id (str, optional): The station to read.
+            room (str, optional): A room from INDOOR_MAPPING, used when station_id is not given.
+            hours (int, optional): Only include the last `hours` before the latest snapshot.
+        Returns:
+            dict: "stationId", "timestamp" and one list per buffered field, oldest first.
+        """
+        if station_id is None:
+            if room not in INDOOR_MAPPING:
+                raise ValueError(f"Unknown room {room}")
+            station_id = INDOOR_MAPPING[room]
+        since = self.date - timedelta(hours=hours) if hours else None
+        trend = {"stationId": station_id}
+        trend.update(self.RECENT.station_series(station_id, since))
+        return trend
+
     def postal_code_to_latlong(
         self, postal_code: str | int
     ) -> tuple[float, float] | None:
@@ -192,12 +355,38 @@ class WeatherAnalyzer:
         Returns:
             tuple: A tuple containing the latitude and longitude, or None if not found.
         """
-        KEY = self.CONFIG["ONEMAPS_KEY"]
-        url = f"https://www.onemap.gov.sg/api/common/elastic/search?searchVal={postal_code}&returnGeom=Y&getAddrDetails=N&pageNum=1"
+        url, headers = self.onemap_request(postal_code)
+        try:
+            data = fetch_json("onemap_search", url, key=str(postal_code), headers=headers, store=self.STORE)
+        except LookupError as e:
+            # Postal code not recorded when replaying
+            print(f"Error converting postal code {postal_code}: {e}")
+            return None
+        return self.parse_onemap_response(data, postal_code)
+
+    def onemap_request(self, postal_code: str | int) -> tuple[str, dict]:
+        """
+        Builds the OneMap search request for a postal code.
+        Parameters:
+            postal_code (str): The postal code to convert.
+        Returns:
+            tuple: The request url and headers.
+        """
+        KEY = self.CONFIG.get("ONEMAPS_KEY")
+        base_url = self.CONFIG.get("ONEMAP_URL") or ONEMAP_URL
+        url = f"{base_url}/api/common/elastic/search?searchVal={postal_code}&returnGeom=Y&getAddrDetails=N&pageNum=1"
         headers = {"Authorization": f"Bearer {KEY}"}
-        response = requests.get(url, headers=headers)
-        data = response.json()
+        return url, headers
 
+    def parse_onemap_response(self, data: dict, postal_code: str | int) -> tuple[float, float] | None:
+        """
+        Extracts the latitude and longitude from a OneMap search response.
+        Parameters:
+            data (dict): The json response.
+            postal_code (str): The postal code searched for.
+        Returns:
+            tuple: A tuple containing the latitude and longitude, or None if not found.
+        """
         if data["found"] > 0:
             try:
                 lat = float(data["results"][0]["LATITUDE"])
@@ -331,6 +520,36 @@ class WeatherAnalyzer:
             "percentile": percentile,
         }
 
+    def analyze_postal_code(self, postal_code: str | int, num_stations: int = 3) -> dict:
+        """
+        Runs the hotspot analysis for a postal code, as served by /api/weather/user/analysis.
+        Parameters:
+            postal_code (str): The postal code to analyze.
+            num_stations (int, optional): Number of nearest stations to use. Default is 3.
+        Returns:
+            dict: The is_hotspot result with the nearest stations' records under "weather_station_data".
+        """
+        location = self.postal_code_to_latlong(postal_code)
+        if location is None:
+            raise ValueError(f"Postal code {postal_code} not found")
+        latitude, longitude = location
+        return self.analyze_location(latitude, longitude, num_stations)
+
+    def analyze_location(self, latitude: float, longitude: float, num_stations: int = 3) -> dict:
+        """
+        Runs the hotspot analysis for a location.
+        Parameters:
+            latitude (float): Latitude of the location.
+            longitude (float): Longitude of the location.
+            num_stations (int, optional): Number of nearest stations to use. Default is 3.
+        Returns:
+            dict: The is_hotspot result with the nearest stations' records under "weather_station_data".
+        """
+        nearest = self.find_nearest_stations(latitude, longitude, num_stations=num_stations)
+        hotspot_data = self.is_hotspot(nearest, latitude, longitude)
+        hotspot_data["weather_station_data"] = nearest.to_dict(orient="records")
+        return hotspot_data
+
     def __filter_data(self, nearest_stations: pd.DataFrame) -> pd.DataFrame:
         """
         Filters historical data based on the nearest weather stations.
@@ -1,19 +1,56 @@
-from flask import Flask, render_template, jsonify, request, abort, Response
+from flask import Flask, render_template, jsonify, request, abort, Response, g
 import pandas as pd
 import requests
 import json
 from analytics.weather_service import WeatherAnalyzer
 from analytics.AI import AI
+from analytics.profiler import RequestProfiler
+from analytics.alerts import HeatAlerts, create_sink
 from dotenv import dotenv_values
+import os
 
 CONFIG = dotenv_values(".env")
 weather_service = WeatherAnalyzer(CONFIG)
 ai_service = AI(CONFIG)
+profiler = RequestProfiler(CONFIG)
+heat_alerts = HeatAlerts(weather_service, create_sink(CONFIG), CONFIG.get("ALERTS_PATH") or "alert_subscriptions.csv")
+weather_service.LISTENERS.append(heat_alerts.evaluate)
+# Refresh on a timer so subscriptions are evaluated without requests; skipped in the debug reloader's parent process
+if __name__ != "__main__" or os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+    weather_service.start_refresher()
 app = Flask(__name__)
 app.config['JSON_SORT_KEYS'] = False
 
 
 
+@app.before_request
+def start_profiling():
+    if profiler.enabled and profiler.should_profile(request.headers):
+        g.profile_session = profiler.start()
+
+
+@app.after_request
+def record_profile_status(response):
+    if g.get("profile_session"):
+        g.profile_status = response.status_code
+    return response
+
+
+@app.teardown_request
+def stop_profiling(exc):
+    session = g.pop("profile_session", None)
+    if session:
+        profiler.stop(
+            session,
+            {
+                "endpoint": request.endpoint,
+                "path": request.path,
+                "args": request.args.to_dict(),
+                "status": g.get("profile_status", 500),
+                "error": repr(exc) if exc else None,
+            },
+        )
+
 
 @app.errorhandler(400)
 def bad_request(e):
@@ -50,12 +87,28 @@ def weather_current():
     return weather_service.get_indoor_summary().to_json(orient="records")
 
 
+@app.route("/api/weather/trend")
+def weather_trend():
+    station = request.args.get("station")
+    room = request.args.get("room")
+    hours = request.args.get("hours", type=int)
+    if not station and not room:
+        abort(400, description="Station or room is required")
+    try:
+        return jsonify(weather_service.get_recent_trend(station, room, hours))
+    except ValueError as e:
+        abort(400, description=str(e))
+
+
 @app.route("/api/weather/user/nearest")
 def get_nearest_data():
     CODE = request.args.get("postal_code")
     if not CODE:
         abort(400, description="Postal code is required")
-    latitude, longitude = weather_service.postal_code_to_latlong(CODE)
+    location = weather_service.postal_code_to_latlong(CODE)
+    if location is None:
+        abort(400, description=f"Postal code {CODE} not found")
+    latitude, longitude = location
     nearest = weather_service.find_nearest_stations(latitude, longitude, num_stations=3)
     print(nearest[["stationId", "location", "airTemp", "humidity", "windSpeed", "heat_score", "distance_weight"]])
     return nearest.to_json(orient="records")
@@ -66,10 +119,10 @@ def perform_analysis(CODE: str | int = None):
     CODE = CODE or request.args.get("postal_code")
     if not CODE:
         abort(400, description="Postal code is required")
-    latitude, longitude = weather_service.postal_code_to_latlong(CODE)
-    nearest = weather_service.find_nearest_stations(latitude, longitude, num_stations=3)
-    hotspot_data = weather_service.is_hotspot(nearest, latitude, longitude)
-    hotspot_data["weather_station_data"] = nearest.to_dict(orient="records")
+    try:
+        hotspot_data = weather_service.analyze_postal_code(CODE)
+    except ValueError as e:
+        abort(400, description=str(e))
     return json.dumps(hotspot_data, indent=4)
 
 @app.route("/api/ai/suggestions")
@@ -89,6 +142,30 @@ def get_suggestions():
     # return suggestions
     return jsonify({"suggestion": suggestions, "data": hotspot_data})
 
+@app.route("/api/ai/usage")
+def get_ai_usage():
+    return jsonify(list(ai_service.USAGE))
+
+@app.route("/api/alerts/subscriptions", methods=["POST"])
+def subscribe_alerts():
+    CODE = request.args.get("postal_code")
+    if not CODE:
+        abort(400, description="Postal code is required")
+    try:
+        return jsonify(heat_alerts.subscribe(CODE, request.args.get("target")))
+    except ValueError as e:
+        abort(400, description=str(e))
+
+
+@app.route("/api/alerts/subscriptions/<int:subscription_id>", methods=["DELETE"])
+def unsubscribe_alerts(subscription_id):
+    try:
+        heat_alerts.unsubscribe(subscription_id)
+    except ValueError as e:
+        abort(400, description=str(e))
+    return jsonify({"deleted": subscription_id})
+
+
 @app.route("/test")
 def test():
     print(weather_service.date)
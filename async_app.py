@@ -0,0 +1,81 @@
+import asyncio
+import json
+from contextlib import asynccontextmanager
+
+from dotenv import dotenv_values
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+from analytics.weather_service import WeatherAnalyzer
+from analytics.AI import AI
+from analytics.async_service import AsyncWeatherService
+from analytics.alerts import HeatAlerts, create_sink
+
+# Async serving path for the I/O-bound routes of app.py, run with:
+#   uvicorn async_app:app --port 5001
+CONFIG = dotenv_values(".env")
+weather_service = WeatherAnalyzer(CONFIG)
+ai_service = AI(CONFIG)
+service = AsyncWeatherService(weather_service, ai_service, CONFIG)
+heat_alerts = HeatAlerts(weather_service, create_sink(CONFIG), CONFIG.get("ALERTS_PATH") or "alert_subscriptions.csv")
+weather_service.LISTENERS.append(heat_alerts.evaluate)
+
+
+def bad_request(description: str) -> JSONResponse:
+    # Same body as the Flask 400 handler
+    return JSONResponse({"error": f"400 Bad Request: {description}"}, status_code=400)
+
+
+async def get_nearest_data(request):
+    CODE = request.query_params.get("postal_code")
+    if not CODE:
+        return bad_request("Postal code is required")
+    try:
+        nearest = await service.find_nearest_stations(CODE, num_stations=3)
+    except ValueError as e:
+        return bad_request(str(e))
+    return Response(nearest.to_json(orient="records"), media_type="application/json")
+
+
+async def perform_analysis(request):
+    CODE = request.query_params.get("postal_code")
+    if not CODE:
+        return bad_request("Postal code is required")
+    try:
+        hotspot_data = await service.analyze_postal_code(CODE)
+    except ValueError as e:
+        return bad_request(str(e))
+    return Response(json.dumps(hotspot_data, indent=4), media_type="application/json")
+
+
+async def get_suggestions(request):
+    CODE = request.query_params.get("postal_code")
+    DIR = request.query_params.get("direction")
+    if not CODE:
+        return bad_request("Postal code is required")
+    if not DIR:
+        return bad_request("House direction is required")
+    try:
+        return JSONResponse(await service.generate_suggestions(CODE, int(DIR)))
+    except ValueError as e:
+        return bad_request(str(e))
+
+
+@asynccontextmanager
+async def lifespan(app):
+    await service.start()
+    refresher = asyncio.create_task(service.refresh_forever())
+    yield
+    refresher.cancel()
+    await service.close()
+
+
+app = Starlette(
+    routes=[
+        Route("/api/weather/user/nearest", get_nearest_data),
+        Route("/api/weather/user/analysis", perform_analysis),
+        Route("/api/ai/suggestions", get_suggestions),
+    ],
+    lifespan=lifespan,
+)
@@ -1,10 +1,17 @@
 #!/bin/sh
 
-# Start Flask app in the background
-python app.py &
+# ANALYTICS_MODE from the environment takes precedence over .env, as in streamlit/app2.py
+if [ -z "$ANALYTICS_MODE" ] && [ -f .env ]; then
+    ANALYTICS_MODE=$(grep -E '^ANALYTICS_MODE=' .env | tail -n 1 | cut -d= -f2- | tr -d "\"'\r ")
+fi
 
-# Wait for 10 seconds to let Flask initialize
-sleep 10
+if [ "$ANALYTICS_MODE" != "inprocess" ]; then
+    # Start Flask app in the background
+    python app.py &
+
+    # Wait for 10 seconds to let Flask initialize
+    sleep 10
+fi
 
 # Start Streamlit app
 streamlit run streamlit/app2.py
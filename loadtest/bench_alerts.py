@@ -0,0 +1,55 @@
+"""
+Benchmarks evaluating heat alert subscriptions against a snapshot, against local fake upstreams.
+
+    python -m loadtest.bench_alerts --subscriptions 100000
+"""
+import argparse
+import logging
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from analytics.alerts import HeatAlerts, WebhookSink
+from analytics.weather_service import WeatherAnalyzer
+from loadtest.fake_upstream import FakeUpstream, generate_history
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--subscriptions", type=int, default=100000)
+    parser.add_argument("--days", type=int, default=365, help="Days of synthetic history")
+    parser.add_argument("--snapshots", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+
+    rng = np.random.default_rng(args.seed)
+    with FakeUpstream() as upstream, tempfile.TemporaryDirectory() as workdir:
+        history = generate_history(os.path.join(workdir, "history.csv"), days=args.days)
+        weather_service = WeatherAnalyzer({"DATA_GOV_URL": upstream, "WEATHER_DATA_PATH": history, "REFRESH_MINUTES": "0"})
+        alerts = HeatAlerts(weather_service, WebhookSink(upstream + "/alerts"))
+
+        start = time.perf_counter()
+        alerts.subscribe_many(
+            rng.uniform(1.25, 1.45, args.subscriptions),
+            rng.uniform(103.65, 104.0, args.subscriptions),
+        )
+        print(f"subscribe_many  {args.subscriptions:>8} subscriptions  {time.perf_counter() - start:8.2f} s")
+
+        for _ in range(args.snapshots):
+            time.sleep(1)
+            snapshot = weather_service.get_current_weather()
+            start = time.perf_counter()
+            transitions = alerts.evaluate(weather_service.date, snapshot)
+            evaluated = time.perf_counter()
+            alerts.dispatcher.join()
+            print(
+                f"evaluate        {args.subscriptions:>8} subscriptions  {(evaluated - start) * 1000:8.1f} ms"
+                f"  {transitions:>7} transitions, sent after {(time.perf_counter() - start) * 1000:8.1f} ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
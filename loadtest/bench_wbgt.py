@@ -0,0 +1,52 @@
+"""
+Benchmarks recomputing WBGT for a full history in one vectorized pass.
+
+    python -m loadtest.bench_wbgt --rows 2600000
+"""
+import argparse
+import time
+
+import numpy as np
+
+from analytics.wbgt import wbgt
+
+# 5 years of hourly readings from ~60 stations
+DEFAULT_ROWS = 5 * 365 * 24 * 60
+
+
+def best_of(fn, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=DEFAULT_ROWS)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    air_temp = rng.uniform(23, 36, args.rows)
+    humidity = rng.uniform(40, 100, args.rows)
+    wind_speed = rng.gamma(2, 1.2, args.rows)
+    uv_index = rng.integers(0, 12, args.rows)
+
+    elapsed = best_of(lambda: wbgt(air_temp, humidity, wind_speed, uv_index), args.repeat)
+    print(f"wbgt            {args.rows:>10} rows  {elapsed * 1000:9.1f} ms  {args.rows / elapsed / 1e6:6.1f} M rows/s")
+
+    # Per-row calls on a sample, for scale
+    sample = min(args.rows, 10000)
+    per_row = best_of(
+        lambda: [wbgt(air_temp[i], humidity[i], wind_speed[i], uv_index[i]) for i in range(sample)],
+        1,
+    )
+    print(f"wbgt (per row)  {args.rows:>10} rows  {per_row / sample * args.rows * 1000:9.1f} ms  (extrapolated from {sample} rows)")
+
+
+if __name__ == "__main__":
+    main()
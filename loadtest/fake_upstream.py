@@ -0,0 +1,175 @@
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+from flask import Flask, jsonify, request
+from werkzeug.serving import make_server
+
+# A handful of real station ids/locations, including every station in INDOOR_MAPPING
+STATIONS = [
+    {"id": "S109", "name": "Ang Mo Kio Avenue 5", "lat": 1.3764, "lon": 103.8492},
+    {"id": "S44", "name": "Nanyang Avenue", "lat": 1.34583, "lon": 103.68166},
+    {"id": "S106", "name": "Pulau Ubin", "lat": 1.4168, "lon": 103.9673},
+    {"id": "S117", "name": "Banyan Road", "lat": 1.256, "lon": 103.679},
+    {"id": "S43", "name": "Kim Chuan Road", "lat": 1.3399, "lon": 103.8878},
+    {"id": "S107", "name": "East Coast Parkway", "lat": 1.3135, "lon": 103.9625},
+    {"id": "S50", "name": "Clementi Road", "lat": 1.3337, "lon": 103.7768},
+    {"id": "S24", "name": "Upper Changi Road North", "lat": 1.3678, "lon": 103.9826},
+    {"id": "S116", "name": "West Coast Highway", "lat": 1.281, "lon": 103.754},
+    {"id": "S60", "name": "Sentosa", "lat": 1.25, "lon": 103.8279},
+]
+
+FAKE_SUGGESTION = (
+    "Summary: The air temperature is around 30°C and the humidity is around 75%. "
+    "Your house is facing N and the current wind direction and speed is NE at 2 m/s. "
+    "Overall, the weather is warm, and is hotter than 60% of historical data.\n"
+    "Suggestions: Open the living room windows facing the breeze and run a fan in the bedroom."
+)
+
+
+def _readings(low: float, high: float, seed: str) -> list[dict]:
+    # The same metric and date always gives the same readings, so synthetic history is reproducible
+    rng = random.Random(seed)
+    return [{"stationId": s["id"], "value": round(rng.uniform(low, high), 1)} for s in STATIONS]
+
+
+def create_app(latency_ms: float = 0, jitter_ms: float = 0, error_rate: float = 0) -> Flask:
+    """
+    Creates a Flask app standing in for data.gov.sg, OneMap and Gemini.
+    Parameters:
+        latency_ms (float): Fixed delay added to every response.
+        jitter_ms (float): Maximum random delay added on top of latency_ms.
+        error_rate (float): Fraction of data.gov.sg requests answered with a 503.
+    Returns:
+        Flask: The fake upstream app.
+    """
+    app = Flask(__name__)
+
+    @app.before_request
+    def delay():
+        time.sleep((latency_ms + random.uniform(0, jitter_ms)) / 1000)
+
+    @app.route("/v2/real-time/api/<metric>")
+    def realtime(metric):
+        ranges = {
+            "air-temperature": (25, 34),
+            "wind-speed": (0, 6),
+            "wind-direction": (0, 359),
+            "relative-humidity": (55, 95),
+        }
+        if error_rate and random.random() < error_rate:
+            return jsonify({"error": "service unavailable"}), 503
+        date = request.args.get("date") or datetime.now().isoformat()
+        if metric == "uv":
+            uv_index = random.Random(metric + date).randint(0, 11)
+            return jsonify({"data": {"records": [{"index": [{"value": uv_index}]}]}})
+        if metric not in ranges:
+            return jsonify({"error": f"unknown metric {metric}"}), 404
+        stations = [
+            {
+                "id": s["id"],
+                "deviceId": s["id"],
+                "name": s["name"],
+                "location": {"latitude": s["lat"], "longitude": s["lon"]},
+            }
+            for s in STATIONS
+        ]
+        return jsonify(
+            {
+                "data": {
+                    "stations": stations,
+                    "readings": [
+                        {
+                            "timestamp": date,
+                            "data": _readings(*ranges[metric], seed=metric + date),
+                        }
+                    ],
+                }
+            }
+        )
+
+    @app.route("/api/common/elastic/search")
+    def onemap_search():
+        # Scatter postal codes deterministically across the island
+        rng = random.Random(request.args.get("searchVal"))
+        return jsonify(
+            {
+                "found": 1,
+                "results": [
+                    {
+                        "LATITUDE": str(rng.uniform(1.25, 1.45)),
+                        "LONGITUDE": str(rng.uniform(103.65, 104.0)),
+                    }
+                ],
+            }
+        )
+
+    @app.route("/<version>/models/<path:model>", methods=["POST"])
+    def gemini(version, model):
+        return jsonify(
+            {
+                "candidates": [
+                    {
+                        "content": {"role": "model", "parts": [{"text": FAKE_SUGGESTION}]},
+                        "finishReason": "STOP",
+                    }
+                ],
+                "usageMetadata": {
+                    "promptTokenCount": len(request.get_data()) // 4,
+                    "candidatesTokenCount": len(FAKE_SUGGESTION) // 4,
+                },
+            }
+        )
+
+    @app.route("/alerts", methods=["POST"])
+    def alerts_webhook():
+        # Local stub for the heat alert webhook sink
+        app.config.setdefault("ALERTS_RECEIVED", []).extend(request.get_json()["events"])
+        return jsonify({"received": len(request.get_json()["events"])})
+
+    return app
+
+
+def generate_history(path: str, days: int = 30, freq: str = "1h", seed: int = 0) -> str:
+    """
+    Writes a synthetic history file in the layout of weather_data_5years.csv.
+    Parameters:
+        path (str): Where to write the csv.
+        days (int): Number of days of history to generate.
+        freq (str): Sampling frequency of the readings.
+        seed (int): Random seed.
+    Returns:
+        str: The path written to.
+    """
+    rng = np.random.default_rng(seed)
+    end = datetime.now().replace(minute=0, second=0, microsecond=0)
+    times = pd.date_range(end - timedelta(days=days), end, freq=freq)
+    stations = pd.DataFrame(STATIONS).rename(columns={"id": "stationId", "name": "location"})
+    df = stations.merge(pd.DataFrame({"date": times.strftime("%Y-%m-%dT%H:%M:%S")}), how="cross")
+    hour = pd.to_datetime(df["date"]).dt.hour
+    diurnal = np.sin((hour - 9) / 24 * 2 * np.pi)
+    df["airTemp"] = (28.5 + 3 * diurnal + rng.normal(0, 0.8, len(df))).round(1)
+    df["humidity"] = (80 - 12 * diurnal + rng.normal(0, 4, len(df))).clip(40, 100).round(1)
+    df["windSpeed"] = rng.gamma(2, 1.2, len(df)).round(1)
+    df["windDirection_deg"] = rng.integers(0, 360, len(df))
+    df.to_csv(path, index=False)
+    return path
+
+
+class FakeUpstream:
+    """Runs the fake upstream app on a background thread, eg. `with FakeUpstream(latency_ms=50) as url: ...`"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency_ms: float = 0, jitter_ms: float = 0, error_rate: float = 0):
+        self.server = make_server(host, port, create_app(latency_ms, jitter_ms, error_rate), threaded=True)
+        self.url = f"http://{host}:{self.server.server_port}"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self) -> str:
+        self.thread.start()
+        return self.url
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
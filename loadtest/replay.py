@@ -0,0 +1,174 @@
+"""
+Replays a mix of endpoint calls against app.py wired to local fake upstreams and reports
+throughput and p50/p95/p99 latency per endpoint.
+
+    python -m loadtest.replay --concurrency 1,8,32 --requests 500 --upstream-latency-ms 50
+    python -m loadtest.replay --recorded calls.jsonl --target http://127.0.0.1:5000
+    python -m loadtest.replay --app async --concurrency 64,256 --upstream-latency-ms 200
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+
+from loadtest.fake_upstream import FakeUpstream, generate_history
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ENDPOINTS = {
+    "current": "/api/weather/current",
+    "nearest": "/api/weather/user/nearest",
+    "analysis": "/api/weather/user/analysis",
+    "suggestions": "/api/ai/suggestions",
+}
+
+DEFAULT_MIX = {"current": 0.4, "nearest": 0.25, "analysis": 0.25, "suggestions": 0.1}
+
+# async_app only serves the I/O-bound routes
+ASYNC_MIX = {"nearest": 0.4, "analysis": 0.4, "suggestions": 0.2}
+
+
+def synthetic_calls(n: int, mix: dict = DEFAULT_MIX, seed: int = 0) -> list[dict]:
+    """
+    Generates n calls drawn from the endpoint mix.
+    Parameters:
+        n (int): Number of calls.
+        mix (dict): Endpoint name to relative weight.
+        seed (int): Random seed.
+    Returns:
+        list[dict]: Calls of the form {"endpoint": name, "params": {...}}.
+    """
+    rng = random.Random(seed)
+    names = list(mix)
+    calls = []
+    for name in rng.choices(names, weights=[mix[k] for k in names], k=n):
+        params = {}
+        if name != "current":
+            params["postal_code"] = f"{rng.randint(10000, 829999):06d}"
+        if name == "suggestions":
+            params["direction"] = rng.randint(0, 359)
+        calls.append({"endpoint": name, "params": params})
+    return calls
+
+
+def recorded_calls(path: str) -> list[dict]:
+    """Loads calls from a jsonl file, one {"endpoint": ..., "params": {...}} per line."""
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def run(target: str, calls: list[dict], concurrency: int, timeout: float = 60) -> dict:
+    """
+    Fires the calls at the target with the given number of concurrent workers.
+    Returns:
+        dict: Endpoint name to list of (latency_s, ok) tuples, plus the wall time under "_elapsed".
+    """
+    local = threading.local()
+    results = {name: [] for name in ENDPOINTS}
+
+    def call(c):
+        if not hasattr(local, "session"):
+            local.session = requests.Session()
+        start = time.perf_counter()
+        try:
+            ok = local.session.get(target + ENDPOINTS[c["endpoint"]], params=c["params"], timeout=timeout).ok
+        except requests.exceptions.RequestException:
+            ok = False
+        results[c["endpoint"]].append((time.perf_counter() - start, ok))
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        list(pool.map(call, calls))
+    results["_elapsed"] = time.perf_counter() - start
+    return results
+
+
+def report(results: dict, concurrency: int):
+    elapsed = results.pop("_elapsed")
+    total = sum(len(r) for r in results.values())
+    print(f"\nconcurrency={concurrency}  requests={total}  elapsed={elapsed:.2f}s  throughput={total / elapsed:.1f} req/s")
+    print(f"{'endpoint':<12}{'count':>7}{'errors':>8}{'req/s':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, rows in results.items():
+        if not rows:
+            continue
+        latencies = np.array([r[0] for r in rows]) * 1000
+        errors = sum(not r[1] for r in rows)
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+        print(f"{name:<12}{len(rows):>7}{errors:>8}{len(rows) / elapsed:>9.1f}{p50:>10.1f}{p95:>10.1f}{p99:>10.1f}")
+
+
+def start_app(workdir: str, upstream: str, port: int, verbose: bool = False, kind: str = "flask") -> subprocess.Popen:
+    """Starts app.py (or async_app.py under uvicorn) in a subprocess configured against the fake upstream, and waits until it serves."""
+    with open(os.path.join(workdir, ".env"), "w") as f:
+        f.write(f"DATA_GOV_URL={upstream}\nONEMAP_URL={upstream}\nGEMINI_URL={upstream}\n")
+        f.write("GEMINI_KEY=fake\nONEMAPS_KEY=fake\n")
+        f.write(f"WEATHER_DATA_PATH={generate_history(os.path.join(workdir, 'history.csv'))}\n")
+    if kind == "async":
+        command = [sys.executable, "-m", "uvicorn", "async_app:app", "--host", "127.0.0.1", "--port", str(port)]
+    else:
+        command = [sys.executable, "-c", f"import app; app.app.run(host='127.0.0.1', port={port}, threaded=True)"]
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    output = None if verbose else subprocess.DEVNULL
+    proc = subprocess.Popen(command, cwd=workdir, env=env, stdout=output, stderr=output)
+    for _ in range(120):
+        try:
+            requests.get(f"http://127.0.0.1:{port}/", timeout=1)
+            return proc
+        except requests.exceptions.RequestException:
+            if proc.poll() is not None:
+                raise RuntimeError("app.py exited during startup")
+            time.sleep(0.5)
+    proc.terminate()
+    raise RuntimeError("app.py did not start within 60s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", help="Base url of an already running app; skips starting app.py and fake upstreams")
+    parser.add_argument("--recorded", help="jsonl file of calls to replay instead of a synthetic mix")
+    parser.add_argument("--requests", type=int, default=200, help="Number of synthetic calls per concurrency level")
+    parser.add_argument("--mix", type=json.loads, help="Endpoint weights as json")
+    parser.add_argument("--app", choices=["flask", "async"], default="flask", help="Serve app.py or async_app.py")
+    parser.add_argument("--concurrency", default="1,8,32", help="Comma separated concurrency levels")
+    parser.add_argument("--upstream-latency-ms", type=float, default=0)
+    parser.add_argument("--upstream-jitter-ms", type=float, default=0)
+    parser.add_argument("--port", type=int, default=5055)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--verbose", action="store_true", help="Show app.py and upstream logs")
+    args = parser.parse_args()
+
+    mix = args.mix or (ASYNC_MIX if args.app == "async" else DEFAULT_MIX)
+    calls = recorded_calls(args.recorded) if args.recorded else synthetic_calls(args.requests, mix, args.seed)
+    levels = [int(c) for c in args.concurrency.split(",")]
+
+    if not args.verbose:
+        logging.getLogger("werkzeug").setLevel(logging.ERROR)
+
+    if args.target:
+        for level in levels:
+            report(run(args.target, calls, level), level)
+        return
+
+    with FakeUpstream(latency_ms=args.upstream_latency_ms, jitter_ms=args.upstream_jitter_ms) as upstream, \
+            tempfile.TemporaryDirectory() as workdir:
+        proc = start_app(workdir, upstream, args.port, args.verbose, args.app)
+        try:
+            for level in levels:
+                report(run(f"http://127.0.0.1:{args.port}", calls, level), level)
+        finally:
+            proc.terminate()
+            proc.wait()
+
+
+if __name__ == "__main__":
+    main()
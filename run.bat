@@ -1,4 +1,8 @@
 @echo off
-start /B python app.py
-timeout /t 12 /nobreak >nul
+rem ANALYTICS_MODE from the environment takes precedence over .env, as in streamlit/app2.py
+if not defined ANALYTICS_MODE if exist .env for /f "usebackq tokens=1,* delims==" %%A in (".env") do if /I "%%A"=="ANALYTICS_MODE" set "ANALYTICS_MODE=%%~B"
+if /I not "%ANALYTICS_MODE%"=="inprocess" (
+    start /B python app.py
+    timeout /t 12 /nobreak >nul
+)
 streamlit run streamlit/app2.py
@@ -57,6 +57,7 @@ document.addEventListener("DOMContentLoaded", () => {
 
       const current = {
         airTemp: parseFloat(airTempAvg),
+        heatStress: avg(data.map(d => d.heatStress)),
         humidity: humidityAvg,
         windSpeed: windSpeedAvg
       };
@@ -109,17 +110,8 @@ document.addEventListener("DOMContentLoaded", () => {
         time.setHours(time.getHours() + i);
         timeLabels.push(time.toLocaleTimeString("en-SG", { hour: '2-digit', minute: '2-digit' }));
     
-        // Simulate slight variation
-        const temp = current.airTemp + (Math.random() * 1.2 - 0.6);      // ±0.6°C
-        const wind = current.windSpeed + (Math.random() * 0.4 - 0.2);    // ±0.2 m/s
-        const humidity = current.humidity + (Math.random() * 1.5 - 0.75); // ±0.75%
-    
-        const wbgt = (
-          0.726330 * temp +
-          0.012713 * wind +
-          0.109697 * humidity -
-          5.12977
-        );
+        // Simulate slight variation around the WBGT computed by the server
+        const wbgt = current.heatStress + (Math.random() * 1.0 - 0.5);   // ±0.5°C
     
         stressValues.push(Number(wbgt.toFixed(2)));
       }
@@ -1,14 +1,47 @@
 import datetime
+import os
+import sys
 import streamlit as st
 import markdown
 import requests
 import pandas as pd
 import random
+from dotenv import dotenv_values
+
+CONFIG = dotenv_values(".env")
+# "http" calls the Flask server, "inprocess" runs WeatherAnalyzer/AI inside the Streamlit process
+ANALYTICS_MODE = os.environ.get("ANALYTICS_MODE") or CONFIG.get("ANALYTICS_MODE") or "http"
+
+
+# Shared analytics services for in-process mode, created once per Streamlit server
+@st.cache_resource
+def get_services():
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from analytics.weather_service import WeatherAnalyzer
+    from analytics.AI import AI
+
+    return WeatherAnalyzer(CONFIG), AI(CONFIG)
+
+
+def get_suggestions_inprocess(postal_code, house_direction):
+    # Same payload as /api/ai/suggestions
+    weather_service, ai_service = get_services()
+    hotspot_data = {"house_orientation": weather_service.angle_to_dir(int(house_direction))}
+    hotspot_data.update(weather_service.analyze_postal_code(postal_code))
+    suggestions = ai_service.generate_suggestions(hotspot_data)
+    return {"suggestion": suggestions, "data": hotspot_data}
 
 
 # Function to fetch weather data
 @st.cache_data(ttl=300)
 def fetch_weather_data():
+    if ANALYTICS_MODE == "inprocess":
+        try:
+            weather_service, _ = get_services()
+            return weather_service.get_indoor_summary().to_dict(orient="records")
+        except Exception as e:
+            st.error(f"Error fetching data: {e}")
+            return []
     try:
         response = requests.get("http://127.0.0.1:5000/api/weather/current")
         response.raise_for_status()
@@ -43,11 +76,8 @@ def generate_time_series(current):
         time = now + datetime.timedelta(hours=i)
         time_labels.append(time.strftime("%H:%M"))
 
-        temp = current["Temperature (°C)"] + (random.uniform(-0.6, 0.6))
-        wind = current["Wind Speed (m/s)"] + (random.uniform(-0.2, 0.2))
-        humidity = current["Humidity (%)"] + (random.uniform(-0.75, 0.75))
-
-        wbgt = 0.726330 * temp + 0.012713 * wind + 0.109697 * humidity - 5.12977
+        # Vary around the WBGT computed by the analytics service
+        wbgt = current["Heat Stress"] + (random.uniform(-0.5, 0.5))
         stress_values.append(wbgt)
 
     return pd.DataFrame({"Time": time_labels, "Heat Stress": stress_values})
@@ -99,14 +129,28 @@ def apply_custom_css():
 
 # Function to simulate API call for weather data
 def fetch_weather_recommendation(postal_code, house_direction):
-    res = requests.get(
-        "http://127.0.0.1:5000/api/ai/suggestions",
-        params={"postal_code": postal_code, "direction": house_direction},
-    )
-    if res.status_code != 200:
-        st.error("Failed to fetch weather data. Please try again later.")
-        return None, None
-    data = res.json()
+    # Recommendations are cached for the session per postal code and direction
+    cache = st.session_state.setdefault("recommendations", {})
+    cache_key = (postal_code, house_direction)
+    if cache_key in cache:
+        return cache[cache_key]
+
+    if ANALYTICS_MODE == "inprocess":
+        try:
+            data = get_suggestions_inprocess(postal_code, house_direction)
+        except Exception as e:
+            print(f"Error generating recommendations for {postal_code}: {e}")
+            st.error("Failed to fetch weather data. Please try again later.")
+            return None, None
+    else:
+        res = requests.get(
+            "http://127.0.0.1:5000/api/ai/suggestions",
+            params={"postal_code": postal_code, "direction": house_direction},
+        )
+        if res.status_code != 200:
+            st.error("Failed to fetch weather data. Please try again later.")
+            return None, None
+        data = res.json()
     # Simulate API response (replace with actual API call)
     weather_station_data = data["data"]["weather_station_data"]
     average_weather_stats = {}
@@ -119,12 +163,14 @@ def fetch_weather_recommendation(postal_code, house_direction):
             )
 
     average_weather_stats["uv_index"] = int(average_weather_stats["uv_index"])
+    suggestions = data["suggestion"]
     # Remove everything before "Summary:"
     if "Summary:" in data["suggestion"]:
         suggestions = data["suggestion"].split("Summary:")[1].strip()
         suggestions = "\n**Summary:** " + suggestions
         suggestions = suggestions.replace("Suggestions:", "\n**Suggestions:** ")
-    return average_weather_stats, markdown.markdown(suggestions)
+    cache[cache_key] = average_weather_stats, markdown.markdown(suggestions)
+    return cache[cache_key]
 
 
 # Main function